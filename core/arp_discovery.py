@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Streamende ARP-Erkennung mit Ratenbegrenzung und adaptiven Wiederholungen"""
+
+import heapq
+import ipaddress
+import queue
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from scapy.all import ARP, Ether, AsyncSniffer, conf
+from scapy.arch.common import compile_filter
+
+
+# Standard-Budget (Pakete pro Sekunde, über alle Interfaces) und
+# Wiederholungen für Stille
+DEFAULT_RATE = 200
+DEFAULT_RETRIES = 2
+
+# Wartezeit vor einer Wiederholung: Vielfaches der längsten gemessenen
+# Antwortzeit, verdoppelt je Versuch, begrenzt auf [MIN_WAIT, MAX_WAIT];
+# ohne Messwert MAX_WAIT
+RTT_FACTOR = 4
+MIN_WAIT = 0.3
+MAX_WAIT = 3.0
+
+# Mindestrate je Interface, damit kleine Netze nicht verhungern
+MIN_INTERFACE_RATE = 10
+
+_DONE = object()
+
+
+def _kernel_filter(iface) -> Optional[str]:
+    """BPF-Filter "arp", falls kompilierbar (libpcap/tcpdump), sonst None"""
+    try:
+        compile_filter("arp", iface)
+        return "arp"
+    except Exception:
+        return None
+
+
+class ArpProbe:
+    """Ein Durchlauf auf einem Interface: Sender-Thread plus Sniffer
+
+    Anfragen gehen gleichmäßig verteilt mit `rate` Paketen pro Sekunde
+    raus. Wiederholungen für stille Adressen sind zeitlich eingeplant und
+    werden zwischen neue Adressen geschoben, so dass auch ein /16 in einem
+    Durchgang läuft statt in Runden. Die Wartezeit vor einer Wiederholung
+    richtet sich nach den gemessenen Antwortzeiten und verdoppelt sich je
+    Versuch (höchstens `max_wait`). Antworten alle, endet der Durchlauf sofort.
+    """
+
+    def __init__(self, targets: Iterable[str], iface: Optional[str] = None,
+                 rate: float = DEFAULT_RATE, retries: int = DEFAULT_RETRIES,
+                 min_wait: float = MIN_WAIT, max_wait: float = MAX_WAIT):
+        self.targets = list(dict.fromkeys(targets))
+        self.wanted = set(self.targets)
+        self.iface = iface or conf.iface
+        self.rate = rate
+        self.retries = retries
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.sent_at: Dict[str, float] = {}
+        self.answered: Dict[str, str] = {}
+        self.max_rtt = None
+        self.replies = queue.Queue()
+        # Gesetzt, wenn alle geantwortet haben oder der Aufrufer abbricht
+        self.stop_event = threading.Event()
+
+    def _on_packet(self, packet):
+        if packet[ARP].op != 2:
+            return
+        ip, mac = packet[ARP].psrc, packet[ARP].hwsrc
+        if ip not in self.wanted:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if ip in self.answered:
+                return
+            self.answered[ip] = mac
+            sent = self.sent_at.get(ip)
+            if sent is not None:
+                rtt = now - sent
+                self.max_rtt = rtt if self.max_rtt is None else max(self.max_rtt, rtt)
+            if len(self.answered) == len(self.wanted):
+                self.stop_event.set()
+        self.replies.put((ip, mac))
+
+    def _retry_wait(self, attempt: int) -> float:
+        with self.lock:
+            rtt = self.max_rtt
+        wait = self.max_wait if rtt is None else min(max(rtt * RTT_FACTOR, self.min_wait), self.max_wait)
+        return min(wait * (2 ** attempt), self.max_wait)
+
+    def _send_loop(self, sock):
+        interval = 1.0 / self.rate if self.rate else 0
+        fresh = iter(self.targets)
+        # (fällig, Versuch, IP); Versuch > retries heißt nur noch auf Antwort warten
+        scheduled: List[Tuple[float, int, str]] = []
+        next_send = time.monotonic()
+        rtt_known = False
+        try:
+            while not self.stop_event.is_set():
+                if not rtt_known and self.max_rtt is not None:
+                    # Erste Messung: ohne Messwert geplante Wiederholungen vorziehen
+                    rtt_known = True
+                    scheduled = [(self.sent_at[ip] + self._retry_wait(attempt - 1), attempt, ip)
+                                 for _, attempt, ip in scheduled]
+                    heapq.heapify(scheduled)
+                now = time.monotonic()
+                if scheduled and scheduled[0][0] <= now:
+                    _, attempt, ip = heapq.heappop(scheduled)
+                    if ip in self.answered or attempt > self.retries:
+                        continue
+                else:
+                    ip = next(fresh, None)
+                    attempt = 0
+                    if ip is None:
+                        with self.lock:
+                            while scheduled and scheduled[0][2] in self.answered:
+                                heapq.heappop(scheduled)
+                        if not scheduled:
+                            break
+                        # Nur noch Wiederholungen offen: bis zur nächsten warten
+                        self.stop_event.wait(scheduled[0][0] - now)
+                        continue
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                packet = Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=ip)
+                # Vor dem Senden eintragen, die Antwort kann sofort kommen
+                sent = time.monotonic()
+                with self.lock:
+                    self.sent_at[ip] = sent
+                sock.send(packet)
+                next_send = max(next_send + interval, sent)
+                heapq.heappush(scheduled, (sent + self._retry_wait(attempt), attempt + 1, ip))
+        finally:
+            self.replies.put(_DONE)
+
+    def run(self) -> Iterator[Tuple[str, str]]:
+        """(IP, MAC) je Antwort, sobald sie eintrifft"""
+        if not self.targets:
+            return
+        started = threading.Event()
+        # Ohne BPF filtert lfilter in Python (langsamer, aber funktionsfähig)
+        sniffer = AsyncSniffer(iface=self.iface, filter=_kernel_filter(self.iface), store=False,
+                               lfilter=lambda p: ARP in p, prn=self._on_packet,
+                               started_callback=started.set)
+        sniffer.start()
+        sock = None
+        try:
+            if not started.wait(2):
+                raise RuntimeError(f"ARP-Sniffer auf {self.iface} startet nicht")
+            sock = conf.L2socket(iface=self.iface)
+            sender = threading.Thread(target=self._send_loop, args=(sock,), daemon=True)
+            sender.start()
+            while True:
+                item = self.replies.get()
+                if item is _DONE:
+                    break
+                yield item
+            # Antworten zwischen letztem get() und Ende des Senders
+            while not self.replies.empty():
+                item = self.replies.get_nowait()
+                if item is not _DONE:
+                    yield item
+        finally:
+            self.stop_event.set()
+            try:
+                sniffer.stop()
+            except Exception:
+                pass
+            if sock is not None:
+                sock.close()
+
+
+def arp_stream(targets: Iterable[str], iface: Optional[str] = None,
+               rate: float = DEFAULT_RATE, retries: int = DEFAULT_RETRIES,
+               min_wait: float = MIN_WAIT, max_wait: float = MAX_WAIT) -> Iterator[Tuple[str, str]]:
+    """ARP-Anfragen an `targets` senden und Antworten streamen"""
+    return ArpProbe(targets, iface, rate, retries, min_wait, max_wait).run()
+
+
+def split_rate(networks: List[Tuple[str, ipaddress.IPv4Network]], rate: float) -> List[float]:
+    """Budget anteilig zur Hostzahl auf die Interfaces verteilen
+
+    Anteile unter MIN_INTERFACE_RATE werden angehoben und gehen vom Rest
+    ab, so dass die Summe `rate` bleibt. Reicht das Budget nicht für alle
+    Mindestraten, wird gleichmäßig geteilt.
+    """
+    sizes = [max(net.num_addresses - 2, 1) for _, net in networks]
+    if not sizes:
+        return []
+    if rate < MIN_INTERFACE_RATE * len(sizes):
+        return [rate / len(sizes)] * len(sizes)
+    rates = [MIN_INTERFACE_RATE] * len(sizes)
+    budget = rate
+    remaining = set(range(len(sizes)))
+    while True:
+        total = sum(sizes[i] for i in remaining)
+        low = [i for i in remaining if budget * sizes[i] / total < MIN_INTERFACE_RATE]
+        if not low:
+            break
+        budget -= MIN_INTERFACE_RATE * len(low)
+        remaining.difference_update(low)
+    for i in remaining:
+        rates[i] = budget * sizes[i] / total
+    return rates
+
+
+def arp_stream_interfaces(networks: List[Tuple[str, ipaddress.IPv4Network]],
+                          rate: float = DEFAULT_RATE, retries: int = DEFAULT_RETRIES,
+                          errors: Optional[list] = None,
+                          exclude: Iterable[str] = ()) -> Iterator[Tuple[str, str, str]]:
+    """Alle Interfaces parallel abfragen, (Interface, IP, MAC) je Antwort
+
+    Das Budget `rate` gilt für alle Interfaces zusammen. Adressen aus
+    `exclude` (z.B. die eigenen) werden nicht abgefragt. Fehler einzelner
+    Interfaces beenden die anderen nicht; sie landen in `errors`.
+    """
+    exclude = set(exclude)
+    merged = queue.Queue()
+    probes = []
+    for (iface, network), iface_rate in zip(networks, split_rate(networks, rate)):
+        targets = (str(ip) for ip in network.hosts() if str(ip) not in exclude)
+        probes.append((iface, ArpProbe(targets, iface, iface_rate, retries)))
+
+    def run(iface, probe):
+        try:
+            for ip, mac in probe.run():
+                merged.put((iface, ip, mac))
+        except Exception as e:
+            if errors is not None:
+                errors.append((iface, e))
+        finally:
+            merged.put(_DONE)
+
+    for iface, probe in probes:
+        threading.Thread(target=run, args=(iface, probe), daemon=True).start()
+    running = len(probes)
+    try:
+        while running:
+            item = merged.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            yield item
+    finally:
+        for _, probe in probes:
+            probe.stop_event.set()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""Indizierter Baseline-Speicher (SQLite)"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    hash TEXT,
+    size INTEGER,
+    mtime REAL,
+    inode INTEGER,
+    ctime REAL,
+    sampled INTEGER DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_parent ON files(parent);
+CREATE TABLE IF NOT EXISTS dirs (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    digest TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+"""
+
+# Erst nach _migrate(), da ältere Baselines die Spalte noch nicht haben
+INDEXES = """
+CREATE INDEX IF NOT EXISTS files_sampled ON files(sampled) WHERE sampled=1;
+"""
+
+FIELDS = ("hash", "size", "mtime", "inode", "ctime", "sampled")
+COLUMNS = ", ".join(FIELDS)
+INSERT_FILE = f"INSERT OR REPLACE INTO files VALUES ({', '.join('?' * (3 + len(FIELDS)))})"
+# Spalten benannt: ältere Baselines können noch stat_digest haben
+INSERT_DIR = "INSERT OR REPLACE INTO dirs (key, path, parent, digest) VALUES (?, ?, ?, ?)"
+
+# Stat-Felder, deren Änderung einen erneuten Hash erzwingt
+STAT_FIELDS = ("inode", "size", "mtime", "ctime")
+
+# Zeilen pro executemany beim Schreiben
+WRITE_BATCH = 2000
+
+# Sekunden, die auf ein gesperrtes Datenbank-Lock gewartet wird
+BUSY_TIMEOUT = 30.0
+
+
+_SEP = os.fsencode(os.sep)
+
+
+def path_key(path: str) -> bytes:
+    """Sortierschlüssel: Pfad-Bytes (os.fsencode), Komponenten mit \\0 getrennt
+
+    Damit entspricht die Sortierung einer Tiefensuche über nach Namen
+    (als Bytes) sortierte Verzeichnisse, und jeder Teilbaum liegt
+    zusammenhängend. Bytes statt Text, damit auch nicht dekodierbare
+    Dateinamen gespeichert und gleich sortiert werden.
+    """
+    return os.fsencode(path).replace(_SEP, b"\0")
+
+
+def _db_path(path: str):
+    """Pfad für die Datenbank: Text, bei nicht dekodierbaren Namen Bytes"""
+    try:
+        path.encode("utf-8")
+        return path
+    except UnicodeEncodeError:
+        return os.fsencode(path)
+
+
+def _from_db(value) -> str:
+    return os.fsdecode(value) if isinstance(value, bytes) else value
+
+
+def _utf8(text: str) -> bytes:
+    return text.encode("utf-8", "surrogateescape")
+
+
+def stat_unchanged(stat: os.stat_result, info: Dict) -> bool:
+    """Prüfe ob Inode, Größe, mtime und ctime zur Baseline passen
+
+    Verglichen wird nur, was die Baseline enthält: aus baseline.json
+    migrierte Einträge haben weder Inode noch ctime.
+    """
+    current = (stat.st_ino, stat.st_size, stat.st_mtime, stat.st_ctime)
+    recorded = [(info.get(k), v) for k, v in zip(STAT_FIELDS, current) if info.get(k) is not None]
+    return bool(recorded) and all(old == new for old, new in recorded)
+
+
+def missing_stat(info: Dict) -> bool:
+    """Fehlen dem Eintrag Stat-Felder (z.B. nach Migration)?"""
+    return any(info.get(k) is None for k in STAT_FIELDS)
+
+
+def is_within(path: str, directory: str) -> bool:
+    """Liegt path in directory (oder ist es)?"""
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+def root_hash(roots: Dict[str, str]) -> str:
+    """Kombiniere die Digests der Baseline-Wurzeln zu einem Host-Hash"""
+    hasher = hashlib.sha256()
+    for root, digest in roots.items():
+        hasher.update(_utf8(f"{root}\0{digest}\n"))
+    return hasher.hexdigest()
+
+
+def build_digests(conn: sqlite3.Connection):
+    """Berechne Merkle-Digests aller Verzeichnisse (Post-Order über die Schlüssel)
+
+    Digest über Namen, Hashes und Größen aller Kinder inkl. Unterverzeichnis-Digests.
+    """
+    row = conn.execute("SELECT value FROM meta WHERE key='directories'").fetchone()
+    roots = sorted((str(Path(d)) for d in (json.loads(row[0]) if row else [])), key=len)
+    roots = roots or [os.sep]
+
+    conn.execute("DELETE FROM dirs")
+    stack = []
+    rows = []
+    root_digests = {}
+
+    def open_dir(path):
+        stack.append((path, hashlib.sha256()))
+
+    def close_dir():
+        path, content = stack.pop()
+        digest = content.hexdigest()
+        rows.append((path_key(path), _db_path(path), _db_path(os.path.dirname(path)), digest))
+        if stack:
+            stack[-1][1].update(_utf8(f"d\0{os.path.basename(path)}\0{digest}\n"))
+        else:
+            root_digests[path] = digest
+        if len(rows) >= WRITE_BATCH:
+            conn.executemany(INSERT_DIR, rows)
+            rows.clear()
+
+    cursor = conn.execute(
+        f"SELECT path, parent, {COLUMNS} FROM files ORDER BY key"
+    )
+    for path, parent, *values in cursor:
+        path, parent = _from_db(path), _from_db(parent)
+        info = dict(zip(FIELDS, values))
+        while stack and not is_within(parent, stack[-1][0]):
+            close_dir()
+        if not stack:
+            open_dir(next((r for r in roots if is_within(parent, r)), parent))
+        while stack[-1][0] != parent:
+            top = stack[-1][0]
+            child = parent[len(top.rstrip(os.sep)):].lstrip(os.sep).split(os.sep)[0]
+            open_dir(os.path.join(top, child))
+
+        name = os.path.basename(path)
+        stack[-1][1].update(_utf8(f"f\0{name}\0{info['hash']}\0{info['size']}\n"))
+    while stack:
+        close_dir()
+
+    if rows:
+        conn.executemany(INSERT_DIR, rows)
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('roots', ?)", (json.dumps(root_digests),))
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('root_hash', ?)",
+                 (json.dumps(root_hash(root_digests)),))
+
+
+class BaselineStore:
+    """Baseline als SQLite-Datei: Streaming-Schreiben, Lookup per Pfad, Iteration"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        # WAL: Leser blockieren Schreiber nicht; Schreiber warten auf das
+        # Lock, statt sofort "database is locked" zu melden
+        self.conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Schema älterer Baselines anpassen"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(files)")}
+        if "sampled" not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN sampled INTEGER DEFAULT 0")
+        self.conn.executescript(INDEXES)
+        if "stat_digest" in {row[1] for row in self.conn.execute("PRAGMA table_info(dirs)")}:
+            # Nie gelesene Spalte älterer Baselines (DROP COLUMN ab SQLite 3.35)
+            try:
+                self.conn.execute("ALTER TABLE dirs DROP COLUMN stat_digest")
+            except sqlite3.OperationalError:
+                pass
+        if self.get_meta("key_format") != "bytes":
+            # Ältere Baselines: Schlüssel als Text; gleiche Bytes, aber als BLOB
+            self.conn.execute("UPDATE files SET key=CAST(key AS BLOB) WHERE typeof(key)='text'")
+            self.conn.execute("UPDATE dirs SET key=CAST(key AS BLOB) WHERE typeof(key)='text'")
+            self.set_meta("key_format", "bytes")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def exists(self) -> bool:
+        """Enthält der Speicher eine Baseline?"""
+        return self.get_meta("created") is not None
+
+    def get_meta(self, key: str, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key: str, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+        self.conn.commit()
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def get(self, path: str) -> Optional[Dict]:
+        """Baseline-Eintrag für einen Pfad"""
+        row = self.conn.execute(
+            f"SELECT {COLUMNS} FROM files WHERE key=?",
+            (path_key(path),)
+        ).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def iter_files(self) -> Iterator[Tuple[str, Dict]]:
+        """Alle Einträge in Schlüsselreihenfolge, ohne alles zu laden"""
+        cursor = self.conn.execute(
+            f"SELECT path, {COLUMNS} FROM files ORDER BY key"
+        )
+        for row in cursor:
+            yield _from_db(row[0]), dict(zip(FIELDS, row[1:]))
+
+    def iter_dir(self, directory: str) -> Iterator[Tuple[str, Dict]]:
+        """Einträge direkt in einem Verzeichnis"""
+        cursor = self.conn.execute(
+            f"SELECT path, {COLUMNS} FROM files WHERE parent=? ORDER BY key",
+            (_db_path(directory),)
+        )
+        for row in cursor:
+            yield _from_db(row[0]), dict(zip(FIELDS, row[1:]))
+
+    def iter_tree(self, directory: str) -> Iterator[Tuple[str, Dict]]:
+        """Alle Einträge unterhalb eines Verzeichnisses (Bereichsabfrage auf dem Schlüssel)"""
+        prefix = path_key(directory.rstrip(os.sep)) + b"\0"
+        cursor = self.conn.execute(
+            f"SELECT path, {COLUMNS} FROM files "
+            "WHERE key >= ? AND key < ? ORDER BY key",
+            (prefix, prefix[:-1] + b"\x01")
+        )
+        for row in cursor:
+            yield _from_db(row[0]), dict(zip(FIELDS, row[1:]))
+
+    def get_dir(self, directory: str) -> Optional[Dict]:
+        """Merkle-Digest eines Verzeichnisses"""
+        row = self.conn.execute(
+            "SELECT digest FROM dirs WHERE key=?", (path_key(directory),)
+        ).fetchone()
+        return {"digest": row[0]} if row else None
+
+    def iter_dirs(self, parent: str = None) -> Iterator[Tuple[str, Dict]]:
+        """Alle Verzeichnisse (oder direkte Unterverzeichnisse von parent)"""
+        if parent is None:
+            cursor = self.conn.execute("SELECT path, digest FROM dirs ORDER BY key")
+        else:
+            cursor = self.conn.execute(
+                "SELECT path, digest FROM dirs WHERE parent=? ORDER BY key",
+                (_db_path(parent),)
+            )
+        for path, digest in cursor:
+            yield _from_db(path), {"digest": digest}
+
+    def root_hash(self) -> str:
+        """Ein Hash über die gesamte Baseline"""
+        return self.get_meta("root_hash", "")
+
+    def diff(self, other: "BaselineStore") -> Iterator[Dict]:
+        """Änderungen gegenüber einer Referenz-Baseline; gleiche Teilbäume werden übersprungen"""
+        if self.root_hash() and self.root_hash() == other.root_hash():
+            return
+        roots = self.get_meta("roots", {})
+        other_roots = other.get_meta("roots", {})
+        for root in sorted(set(roots) | set(other_roots)):
+            if roots.get(root) != other_roots.get(root):
+                yield from self._diff_dir(other, root)
+
+    def _diff_dir(self, other: "BaselineStore", directory: str) -> Iterator[Dict]:
+        mine = dict(self.iter_dir(directory))
+        theirs = dict(other.iter_dir(directory))
+        for path in sorted(set(mine) | set(theirs)):
+            if path not in mine:
+                yield {"type": "DELETED", "file": path}
+            elif path not in theirs:
+                yield {"type": "ADDED", "file": path}
+            elif mine[path]["hash"] != theirs[path]["hash"]:
+                yield {"type": "MODIFIED", "file": path}
+
+        subdirs = dict(self.iter_dirs(directory))
+        other_subdirs = dict(other.iter_dirs(directory))
+        for path in sorted(set(subdirs) | set(other_subdirs)):
+            if path not in subdirs:
+                for filepath, info in other.iter_tree(path):
+                    yield {"type": "DELETED", "file": filepath}
+            elif path not in other_subdirs:
+                for filepath, info in self.iter_tree(path):
+                    yield {"type": "ADDED", "file": filepath}
+            elif subdirs[path]["digest"] != other_subdirs[path]["digest"]:
+                yield from self._diff_dir(other, path)
+
+    def iter_sampled(self) -> Iterator[Tuple[str, Dict]]:
+        """Nur stichprobenartig gehashte Einträge"""
+        cursor = self.conn.execute(f"SELECT path, {COLUMNS} FROM files WHERE sampled=1 ORDER BY key")
+        for row in cursor:
+            yield _from_db(row[0]), dict(zip(FIELDS, row[1:]))
+
+    def rebuild_digests(self):
+        """Verzeichnis-Digests und Root-Hash neu berechnen (nach Änderungen an Einträgen)"""
+        build_digests(self.conn)
+        self.conn.commit()
+
+    def put(self, path: str, info: Dict):
+        """Einzelnen Eintrag setzen/aktualisieren"""
+        try:
+            self.conn.execute(INSERT_FILE, self._row(path, info))
+            self.conn.commit()
+        except sqlite3.Error:
+            # Keine offene Transaktion zurücklassen, der Aufrufer kann wiederholen
+            self.conn.rollback()
+            raise
+
+    def put_many(self, items: Iterable[Tuple[str, Dict]]):
+        """Mehrere Einträge in einer Transaktion setzen"""
+        self.conn.executemany(INSERT_FILE, [self._row(path, info) for path, info in items])
+        self.conn.commit()
+
+    def delete(self, path: str):
+        self.conn.execute("DELETE FROM files WHERE key=?", (path_key(path),))
+        self.conn.commit()
+
+    @staticmethod
+    def _row(path: str, info: Dict) -> Tuple:
+        return (path_key(path), _db_path(path), _db_path(os.path.dirname(path)),
+                info.get("hash"), info.get("size"), info.get("mtime"), info.get("inode"),
+                info.get("ctime"), int(bool(info.get("sampled"))))
+
+    @classmethod
+    def build(cls, db_path: Path, created: str) -> "BaselineWriter":
+        """Neue Baseline streamend schreiben (ersetzt die alte erst bei commit)"""
+        return BaselineWriter(Path(db_path), created)
+
+
+def _checkpoint(db_path: Path):
+    """WAL der alten Baseline einarbeiten, damit er nicht zur neuen Datei gelesen wird"""
+    if not os.path.exists(str(db_path) + "-wal"):
+        return
+    try:
+        conn = sqlite3.connect(str(db_path), timeout=BUSY_TIMEOUT)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+
+
+class BaselineWriter:
+    """Schreibt eine neue Baseline in eine temporäre Datei und tauscht sie atomar aus"""
+
+    def __init__(self, db_path: Path, created: str):
+        self.db_path = db_path
+        self.tmp_path = db_path.with_suffix(db_path.suffix + ".tmp")
+        if self.tmp_path.exists():
+            self.tmp_path.unlink()
+        self.conn = sqlite3.connect(str(self.tmp_path))
+        # Temporäre Datei: kein Journal nötig, sie wird erst am Ende übernommen
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.executescript(SCHEMA + INDEXES)
+        self.conn.execute("INSERT INTO meta VALUES ('created', ?)", (json.dumps(created),))
+        self.conn.execute("INSERT INTO meta VALUES ('key_format', ?)", (json.dumps("bytes"),))
+        self.buffer = []
+        self.count = 0
+        # Pfade, die nicht gespeichert werden konnten
+        self.skipped = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def add(self, path: str, info: Dict):
+        self.buffer.append(BaselineStore._row(path, info))
+        self.count += 1
+        if len(self.buffer) >= WRITE_BATCH:
+            self._flush()
+
+    def set_meta(self, key: str, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        try:
+            self.conn.executemany(INSERT_FILE, self.buffer)
+        except (sqlite3.Error, ValueError):
+            # Einzeln wiederholen, damit ein fehlerhafter Eintrag nicht alle kostet
+            for row in self.buffer:
+                try:
+                    self.conn.execute(INSERT_FILE, row)
+                except (sqlite3.Error, ValueError):
+                    self.skipped.append(_from_db(row[1]))
+                    self.count -= 1
+        self.buffer = []
+
+    def commit(self):
+        if self.conn is None:
+            return
+        self._flush()
+        build_digests(self.conn)
+        self.conn.commit()
+        self.conn.close()
+        self.conn = None
+        with open(self.tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        _checkpoint(self.db_path)
+        os.replace(self.tmp_path, self.db_path)
+
+    def abort(self):
+        if self.conn is None:
+            return
+        self.conn.close()
+        self.conn = None
+        try:
+            self.tmp_path.unlink()
+        except:
+            pass
+
+
+def migrate_json(json_path: Path, db_path: Path) -> int:
+    """Übernimm eine alte baseline.json in den SQLite-Speicher"""
+    with open(json_path, 'r') as f:
+        baseline = json.load(f)
+
+    with BaselineStore.build(db_path, baseline.get("created", "")) as writer:
+        for filepath, info in baseline.get("files", {}).items():
+            writer.add(filepath, info)
+        count = writer.count
+
+    json_path.rename(json_path.with_suffix(".json.migrated"))
+    return count
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Digest-Schicht: wählbare Hash-Algorithmen und puffer-schonendes Datei-Hashing"""
+
+import hashlib
+import os
+import threading
+import zlib
+from typing import Callable, Dict, List
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+# Standard für Beweissicherung (Forensik, Reports)
+EVIDENCE_ALGORITHM = "sha256"
+
+# Lesepuffer, pro Thread einmal angelegt und wiederverwendet
+READ_BUFFER = 1024 * 1024
+
+
+class _Crc32:
+    """CRC32 mit hashlib-kompatibler Schnittstelle (nur Änderungserkennung)"""
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self) -> str:
+        return f"{self.value:08x}"
+
+
+ALGORITHMS: Dict[str, Callable] = {
+    "sha256": hashlib.sha256,
+    "blake2b": lambda: hashlib.blake2b(digest_size=32),
+    "crc32": _Crc32,
+}
+
+if blake3 is not None:
+    ALGORITHMS["blake3"] = blake3.blake3
+
+if xxhash is not None:
+    ALGORITHMS["xxh3_128"] = xxhash.xxh3_128
+    ALGORITHMS["xxh64"] = xxhash.xxh64
+
+# Nicht-kryptografisch: nur zur Erkennung versehentlicher Änderungen geeignet
+NON_CRYPTOGRAPHIC = {"crc32", "xxh3_128", "xxh64"}
+
+_local = threading.local()
+
+
+def available_algorithms() -> List[str]:
+    """Auf diesem System verfügbare Algorithmen"""
+    return list(ALGORITHMS)
+
+
+def new_hasher(algorithm: str = EVIDENCE_ALGORITHM):
+    """Neues Hash-Objekt für einen Algorithmus"""
+    try:
+        return ALGORITHMS[algorithm]()
+    except KeyError:
+        raise ValueError(f"Unbekannter Hash-Algorithmus: {algorithm} "
+                         f"(verfügbar: {', '.join(ALGORITHMS)})")
+
+
+def _buffer(size: int) -> memoryview:
+    """Wiederverwendbarer Lesepuffer des aktuellen Threads"""
+    buf = getattr(_local, "buffer", None)
+    if buf is None or len(buf) != size:
+        buf = memoryview(bytearray(size))
+        _local.buffer = buf
+    return buf
+
+
+def hash_stream(f, algorithm: str = EVIDENCE_ALGORITHM,
+                buffer_size: int = READ_BUFFER) -> str:
+    """Hashe eine ungepuffert geöffnete Datei (open(..., 'rb', buffering=0))
+
+    readinto() in einen wiederverwendeten Puffer, so dass pro Block kein
+    neues bytes-Objekt entsteht. Bewusst kein mmap: wird die Datei
+    währenddessen gekürzt, endet das mit SIGBUS statt einer Exception.
+    """
+    hasher = new_hasher(algorithm)
+    buf = _buffer(buffer_size)
+    while True:
+        n = f.readinto(buf)
+        if not n:
+            break
+        hasher.update(buf[:n])
+    return hasher.hexdigest()
+
+
+def hash_sampled(filepath, algorithm: str = EVIDENCE_ALGORITHM, blocks: int = 16,
+                 block_size: int = READ_BUFFER) -> str:
+    """Stichproben-Digest: Anfang, Ende und `blocks` gleichmäßig verteilte Blöcke
+
+    Größe und Offsets fließen mit ein. Erkennt Größenänderungen und
+    Änderungen in den gelesenen Blöcken, aber nicht dazwischen.
+    """
+    new_hasher(algorithm)
+    try:
+        with open(filepath, 'rb', buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            hasher = new_hasher(algorithm)
+            hasher.update(f"{size}\0{blocks}\0{block_size}\0".encode())
+
+            last = max(size - block_size, 0)
+            offsets = {0, last}
+            if blocks > 0 and last > 0:
+                step = last / (blocks + 1)
+                offsets.update(int(step * (i + 1)) for i in range(blocks))
+
+            buf = _buffer(block_size)
+            for offset in sorted(offsets):
+                f.seek(offset)
+                n = f.readinto(buf)
+                hasher.update(offset.to_bytes(8, "little"))
+                hasher.update(buf[:n or 0])
+            return hasher.hexdigest()
+    except:
+        return ""
+
+
+def hash_file(filepath, algorithm: str = EVIDENCE_ALGORITHM,
+              buffer_size: int = READ_BUFFER) -> str:
+    """Berechne Digest einer Datei ("" bei Fehler)"""
+    # Unbekannter Algorithmus ist ein Aufruffehler, keine unlesbare Datei
+    new_hasher(algorithm)
+    try:
+        with open(filepath, 'rb', buffering=0) as f:
+            return hash_stream(f, algorithm, buffer_size)
+    except:
+        return ""
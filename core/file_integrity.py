@@ -1,81 +1,378 @@
 #!/usr/bin/env python3
 """Datei-Integritäts-Monitor"""
 
-import hashlib
+import json
 import os
+import threading
+import time
 from pathlib import Path
-from typing import Dict, List
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 
+from .baseline_store import BaselineStore, migrate_json, missing_stat, path_key, stat_unchanged
+from .digests import EVIDENCE_ALGORITHM, READ_BUFFER, hash_file
+from .hash_engine import (HashEngine, HashPipeline, ProgressTracker, MODE_FULL, MODE_SAMPLED,
+                          walk_sorted)
+from .integrity_watcher import IntegrityWatcher
+from .sample_verifier import SampleVerifier
+from .scan_profiles import ScanProfile, get_profile
+
+
+# Zuletzt vom Watch gemeldete Änderungen, die im Speicher bleiben
+MAX_CHANGES = 1000
+
+
+def _run_to_end(generator):
+    """Generator vollständig abarbeiten und dessen Rückgabewert liefern"""
+    while True:
+        try:
+            next(generator)
+        except StopIteration as stop:
+            return stop.value
+
 
 class FileIntegrityMonitor:
     """Datei-Integritäts-Überwachung"""
     
-    def __init__(self, logger):
+    def __init__(self, logger, workers: int = None, progress: Callable[[Dict], None] = None,
+                 algorithm: str = EVIDENCE_ALGORITHM, sample_threshold: int = None,
+                 sample_blocks: int = 16):
         self.logger = logger
-        self.baseline_file = Path.home() / ".cyberguardian" / "baseline.json"
+        self.baseline_file = Path.home() / ".cyberguardian" / "baseline.db"
+        self.legacy_baseline_file = Path.home() / ".cyberguardian" / "baseline.json"
+        self.state_file = Path.home() / ".cyberguardian" / "integrity_state.json"
+        # Vollständiger Rehash ("paranoid") spätestens alle 7 Tage
+        self.paranoid_interval = 7 * 24 * 3600
         self.watch_dirs = []
-        self.changes = []
+        self.changes = deque(maxlen=MAX_CHANGES)
+        self.workers = workers
+        self.progress = progress
+        # Algorithmus für neue Baselines; Vergleiche nutzen den der Baseline
+        self.algorithm = algorithm
+        # Dateien ab sample_threshold Bytes zunächst nur stichprobenartig hashen
+        self.sampling = None
+        if sample_threshold:
+            self.sampling = {"threshold": sample_threshold, "blocks": sample_blocks,
+                             "block_size": READ_BUFFER}
+        self.verifier = None
+        self.watcher = None
+        self.watch_callback = None
+        self.cancel_event = threading.Event()
+
+    def _engine(self, algorithm: str = None, sampling: Dict = None) -> HashEngine:
+        """Hash-Engine mit konfigurierter Worker-Anzahl"""
+        return HashEngine(workers=self.workers, algorithm=algorithm or self.algorithm,
+                          sampling=sampling)
+        
+    def _open_store(self) -> BaselineStore:
+        """Öffne Baseline-Speicher (migriert alte baseline.json automatisch)"""
+        if self.legacy_baseline_file.exists() and not self.baseline_file.exists():
+            count = migrate_json(self.legacy_baseline_file, self.baseline_file)
+            self.logger.log("INFO", f"Baseline migriert: {count} Dateien nach {self.baseline_file.name}")
+        return BaselineStore(self.baseline_file)
         
     def calculate_hash(self, filepath: Path) -> str:
         """Berechne Hash einer Datei"""
+        return hash_file(str(filepath), self.algorithm)
+            
+    def cancel(self):
+        """Brich laufende Baseline-Erstellung bzw. Vergleich ab"""
+        self.cancel_event.set()
+        
+    def create_baseline(self, directories: List[str] = None, profile: str = None) -> Dict:
+        """Erstelle Baseline für Verzeichnisse
+        
+        Die Einträge werden direkt in den Baseline-Speicher gestreamt;
+        zurückgegeben wird nur eine Zusammenfassung.
+        """
+        return _run_to_end(self.iter_create_baseline(directories, profile=profile))
+        
+    def iter_create_baseline(self, directories: List[str] = None,
+                             progress: Callable[[Dict], None] = None,
+                             profile: str = None) -> Iterator[Tuple[str, Dict]]:
+        """Erstelle Baseline als Generator: liefert (pfad, info) je gehashter Datei
+        
+        profile wählt ein Scan-Profil (Wurzeln + Regeln, siehe scan_profiles);
+        ohne Verzeichnisse und Profil gilt "default". Explizite Verzeichnisse
+        ohne Profil werden vollständig gescannt.
+        
+        Bei Abbruch (cancel() oder Schließen des Generators) bleibt die
+        bisherige Baseline unverändert. Rückgabewert ist die Zusammenfassung.
+        """
+        self.cancel_event.clear()
+        self.stop_verification()
+        watching = self.watcher is not None and self.watcher.running
+        created = datetime.now().isoformat()
+        scan_profile = None
+        if profile is not None or not directories:
+            scan_profile = get_profile(profile or "default")
+            if scan_profile is None:
+                raise ValueError(f"Unbekanntes Scan-Profil: {profile}")
+        dirs = directories or scan_profile.roots
+        self.baseline_file.parent.mkdir(parents=True, exist_ok=True)
+        
+        with self._open_store() as store:
+            tracker = ProgressTracker(progress or self.progress,
+                                      total_files=store.count() if store.exists() else 0,
+                                      total_bytes=store.get_meta("total_bytes", 0))
+            
+        engine = self._engine(sampling=self.sampling)
+        writer = BaselineStore.build(self.baseline_file, created)
+        sampled = 0
         try:
-            hasher = hashlib.sha256()
-            with open(filepath, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
-        except:
-            return ""
+            writer.set_meta("directories", [str(d) for d in dirs])
+            writer.set_meta("algorithm", self.algorithm)
+            writer.set_meta("sampling", self.sampling)
+            writer.set_meta("profile", scan_profile.to_dict() if scan_profile else None)
+            for filepath, info in engine.hash_tree(dirs, scan_profile):
+                if self.cancel_event.is_set():
+                    writer.abort()
+                    self.logger.log("INFO", "Baseline-Erstellung abgebrochen")
+                    return {"created": created, "count": 0, "cancelled": True}
+                try:
+                    writer.add(filepath, info)
+                except Exception as e:
+                    self.logger.log("WARNING", f"Baseline: {filepath!r} übersprungen: {e}")
+                    continue
+                sampled += info["sampled"]
+                tracker.update(filepath, info["size"])
+                yield filepath, info
+            writer.set_meta("total_bytes", tracker.bytes)
+            if watching:
+                # Der Watch hält die alte Datei offen; nach dem Austausch neu starten
+                self.stop_watch()
+            writer.commit()
+            count = writer.count
+        finally:
+            writer.abort()
+            if watching:
+                self.start_watch(callback=self.watch_callback)
+        for filepath in writer.skipped:
+            self.logger.log("WARNING", f"Baseline: {filepath!r} konnte nicht gespeichert werden")
+        tracker.report()
             
-    def create_baseline(self, directories: List[str] = None) -> Dict:
-        """Erstelle Baseline für Verzeichnisse"""
-        baseline = {"created": datetime.now().isoformat(), "files": {}}
-        
-        dirs = directories or ["/etc", str(Path.home())]
-        
-        for directory in dirs:
-            path = Path(directory)
-            if path.exists():
-                for root, dirs, files in os.walk(path):
-                    for file in files:
-                        filepath = Path(root) / file
-                        try:
-                            stat = filepath.stat()
-                            baseline["files"][str(filepath)] = {
-                                "hash": self.calculate_hash(filepath),
-                                "size": stat.st_size,
-                                "mtime": stat.st_mtime
-                            }
-                        except:
-                            pass
-                            
-        with open(self.baseline_file, 'w') as f:
-            import json
-            json.dump(baseline, f, indent=2)
+        baseline = {"created": created, "count": count, "store": str(self.baseline_file),
+                    "root_hash": self.root_hash(), "sampled": sampled}
             
-        self.logger.log("INFO", f"Baseline erstellt: {len(baseline['files'])} Dateien")
+        stats = engine.stats()
+        self.logger.log("INFO", f"Baseline erstellt: {count} Dateien "
+                        f"({stats['files_per_sec']:.0f} Dateien/s, "
+                        f"{stats['bytes_per_sec'] / 1024 / 1024:.1f} MiB/s)")
+        self._save_state({"last_paranoid": time.time()})
+        if sampled:
+            self.logger.log("INFO", f"{sampled} große Dateien nur stichprobenartig gehasht, "
+                            "Voll-Verifikation läuft im Hintergrund")
+            self.start_verification()
         return baseline
         
-    def compare_baseline(self) -> List[Dict]:
-        """Vergleiche aktuelle Dateien mit Baseline"""
-        changes = []
+    def resume_verification(self):
+        """Voll-Verifikation fortsetzen, falls die Baseline noch Stichproben-Einträge hat"""
+        if (self.verifier and self.verifier.running) or not self.baseline_file.exists():
+            return
+        with self._open_store() as store:
+            pending = next(store.iter_sampled(), None) is not None
+        if pending:
+            self.start_verification()
+
+    def start_verification(self):
+        """Starte die Voll-Verifikation stichprobenartig gehashter Dateien"""
+        if self.verifier and self.verifier.running:
+            return
+        self.verifier = SampleVerifier(self.logger, self.baseline_file)
+        self.verifier.start()
+        
+    def stop_verification(self):
+        """Stoppe die Voll-Verifikation"""
+        if self.verifier:
+            self.verifier.stop()
+            self.verifier = None
         
+    def _load_state(self) -> Dict:
+        """Lade Zustand (letzter vollständiger Vergleich)"""
         try:
-            with open(self.baseline_file, 'r') as f:
-                import json
-                baseline = json.load(f)
-                
-            for filepath, info in baseline["files"].items():
-                path = Path(filepath)
-                if not path.exists():
-                    changes.append({"type": "DELETED", "file": filepath})
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except:
+            return {}
+            
+    def _save_state(self, state: Dict):
+        """Speichere Zustand"""
+        try:
+            with open(self.state_file, 'w') as f:
+                json.dump(state, f)
+        except:
+            pass
+            
+    def paranoid_due(self) -> bool:
+        """Ist ein vollständiger Rehash fällig?"""
+        last = self._load_state().get("last_paranoid", 0)
+        return time.time() - last >= self.paranoid_interval
+        
+    def compare_baseline(self, paranoid: bool = None) -> List[Dict]:
+        """Vergleiche aktuelle Dateien mit Baseline
+        
+        Live-Verzeichnisbaum und Baseline werden in derselben Sortierung
+        gelesen und in einem Durchlauf zusammengeführt. Ergebnis-Typen:
+        ADDED, DELETED, MODIFIED, METADATA_CHANGED.
+        
+        Standardmäßig inkrementell: nur Dateien, deren Inode, Größe, mtime
+        oder ctime von der Baseline abweicht, werden neu gehasht.
+        paranoid=True hasht alles; None entscheidet anhand paranoid_interval.
+        """
+        return list(self.iter_compare_baseline(paranoid))
+        
+    def iter_compare_baseline(self, paranoid: bool = None,
+                              progress: Callable[[Dict], None] = None) -> Iterator[Dict]:
+        """Vergleich als Generator: liefert jede Änderung, sobald sie feststeht"""
+        self.cancel_event.clear()
+        
+        if paranoid is None:
+            paranoid = self.paranoid_due()
+            
+        try:
+            with self._open_store() as store:
+                if not store.exists():
+                    raise FileNotFoundError(f"Keine Baseline: {self.baseline_file}")
+                    
+                tracker = ProgressTracker(progress or self.progress, total_files=store.count(),
+                                          total_bytes=store.get_meta("total_bytes", 0))
+                    
+                directories = store.get_meta("directories")
+                profile = store.get_meta("profile")
+                if directories:
+                    live = walk_sorted(directories, ScanProfile.from_dict(profile) if profile else None)
                 else:
-                    current_hash = self.calculate_hash(path)
-                    if current_hash != info["hash"]:
-                        changes.append({"type": "MODIFIED", "file": filepath})
+                    # Migrierte Baseline ohne Wurzeln: nur bekannte Dateien prüfen
+                    self.logger.log("WARNING", "Baseline ohne Verzeichnisliste, neue Dateien werden nicht erkannt")
+                    live = self._stat_known(store.iter_files())
+                    
+                algorithm = store.get_meta("algorithm", EVIDENCE_ALGORITHM)
+                sampling = store.get_meta("sampling")
+                backfill = []
+                with self._engine(algorithm, sampling).pipeline() as pipe:
+                    for change in self._merge(live, store.iter_files(), paranoid, pipe, tracker):
+                        if self.cancel_event.is_set():
+                            self.logger.log("INFO", "Baseline-Vergleich abgebrochen")
+                            return
+                        if change:
+                            yield change
+                        for result in pipe.ready():
+                            yield from self._hash_result(*result, backfill)
+                    for result in pipe.finish():
+                        yield from self._hash_result(*result, backfill)
+                if backfill:
+                    # Verifizierte Einträge um Inode/ctime ergänzen, danach greift der Stat-Vergleich voll
+                    store.put_many(backfill)
+                tracker.report()
+                    
+            if paranoid:
+                self._save_state({"last_paranoid": time.time()})
+            # Nach einem Neustart offene Stichproben weiter verifizieren
+            self.resume_verification()
                         
         except Exception as e:
             self.logger.log("ERROR", f"Baseline-Vergleich fehlgeschlagen: {e}")
             
-        return changes
+    def _hash_result(self, filepath: str, tag, current: Dict, backfill: list) -> Iterator[Dict]:
+        """Bewerte ein Hash-Ergebnis aus dem Vergleich"""
+        info, stat_changed = tag
+        if current is None:
+            change = {"type": "DELETED", "file": filepath}
+        elif current["hash"] != info["hash"]:
+            change = {"type": "MODIFIED", "file": filepath}
+        elif stat_changed:
+            change = {"type": "METADATA_CHANGED", "file": filepath}
+        else:
+            if missing_stat(info):
+                backfill.append((filepath, dict(info, inode=current["inode"], ctime=current["ctime"])))
+            return
+        if info.get("sampled"):
+            # Baseline-Eintrag ist nur stichprobenartig verifiziert
+            change["sampled"] = True
+        yield change
+            
+    def _merge(self, live: Iterator, baseline: Iterator, paranoid: bool,
+               pipe: HashPipeline, tracker: ProgressTracker) -> Iterator[Optional[Dict]]:
+        """Sortierter Merge von Live-Baum und Baseline
+        
+        Liefert direkt feststehende Änderungen, sonst None nach jedem
+        Schritt; neu zu hashende Dateien gehen mit ihrem Baseline-Eintrag
+        in die Hash-Pipeline.
+        """
+        missing = object()
+        live_item = next(live, missing)
+        base_item = next(baseline, missing)
+        
+        while live_item is not missing or base_item is not missing:
+            live_key = path_key(live_item[0]) if live_item is not missing else None
+            base_key = path_key(base_item[0]) if base_item is not missing else None
+            
+            if base_key is None or (live_key is not None and live_key < base_key):
+                tracker.update(live_item[0], live_item[1].st_size)
+                yield {"type": "ADDED", "file": live_item[0]}
+                live_item = next(live, missing)
+            elif live_key is None or base_key < live_key:
+                yield {"type": "DELETED", "file": base_item[0]}
+                base_item = next(baseline, missing)
+            else:
+                filepath, stat = live_item
+                info = base_item[1]
+                tracker.update(filepath, stat.st_size)
+                stat_changed = not stat_unchanged(stat, info)
+                # Einträge ohne Inode/ctime einmal verifizieren, um sie zu ergänzen
+                if paranoid or stat_changed or missing_stat(info):
+                    mode = MODE_SAMPLED if info.get("sampled") else MODE_FULL
+                    pipe.submit(filepath, (info, stat_changed), mode)
+                yield None
+                live_item = next(live, missing)
+                base_item = next(baseline, missing)
+                
+    def _stat_known(self, files: Iterator) -> Iterator:
+        """Live-Stat nur für Baseline-Pfade (Fallback ohne Verzeichnisliste)"""
+        for filepath, info in files:
+            try:
+                yield filepath, os.stat(filepath)
+            except OSError:
+                pass
+                
+    def root_hash(self) -> str:
+        """Merkle-Wurzel der aktuellen Baseline (gleicher Hash = identische Baseline)"""
+        with self._open_store() as store:
+            return store.root_hash()
+            
+    def compare_baselines(self, other_file: str) -> List[Dict]:
+        """Änderungen der Baseline gegenüber einer anderen baseline.db (z.B. ältere Kopie, zweiter Host)"""
+        with self._open_store() as store, BaselineStore(Path(other_file)) as other:
+            return list(store.diff(other))
+            
+    def start_watch(self, directories: List[str] = None, callback: Callable[[Dict], None] = None):
+        """Starte Echtzeit-Überwachung der Baseline-Verzeichnisse (inotify)"""
+        if self.watcher and self.watcher.running:
+            return
+        if directories is None:
+            with self._open_store() as store:
+                directories = store.get_meta("directories", [])
+        if not directories:
+            self.logger.log("ERROR", "Keine Verzeichnisse für Integritäts-Watch (Baseline fehlt?)")
+            return
+            
+        self.watch_dirs = list(directories)
+        self.watch_callback = callback
+        
+        def on_change(change: Dict):
+            self.changes.append(change)
+            if callback:
+                callback(change)
+                
+        self.watcher = IntegrityWatcher(self.logger, self.baseline_file, self.watch_dirs,
+                                        callback=on_change)
+        self.watcher.start()
+        self.resume_verification()
+        
+    def stop_watch(self):
+        """Stoppe Echtzeit-Überwachung"""
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+            self.logger.log("INFO", "Integritäts-Watch gestoppt")
@@ -7,6 +7,8 @@ from pathlib import Path
 from typing import Dict, List
 from datetime import datetime
 
+from .digests import EVIDENCE_ALGORITHM, hash_stream
+
 
 class ForensicsTools:
     """Forensik-Analyse Tools"""
@@ -88,11 +90,9 @@ class ForensicsTools:
                     "owner_uid": stat.st_uid
                 }
                 
-                import hashlib
-                hasher = hashlib.sha256()
-                with open(filepath, 'rb') as f:
-                    hasher.update(f.read())
-                result["hash"] = hasher.hexdigest()
+                # hash_stream statt hash_file: Lesefehler sollen in "error" landen
+                with open(filepath, 'rb', buffering=0) as f:
+                    result["hash"] = hash_stream(f, EVIDENCE_ALGORITHM)
                 
         except Exception as e:
             result["error"] = str(e)
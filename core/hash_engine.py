@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""Paralleles Hashing für Datei-Baselines"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .digests import EVIDENCE_ALGORITHM, READ_BUFFER, hash_file, hash_sampled
+
+
+# Pfade pro Auftrag an einen Worker-Prozess
+BATCH_SIZE = 64
+
+
+# Hash-Modi pro Datei: None = nach Schwellwert, sonst erzwungen
+MODE_FULL = "full"
+MODE_SAMPLED = "sampled"
+
+
+def hash_with_mode(filepath: str, size: int, algorithm: str, buffer_size: int,
+                   sampling: Optional[Dict], mode: Optional[str] = None) -> Tuple[str, bool]:
+    """Hash einer Datei, ggf. nur als Stichprobe; liefert (digest, sampled)"""
+    if mode is None:
+        sampled = bool(sampling) and size >= sampling["threshold"]
+    else:
+        sampled = mode == MODE_SAMPLED and bool(sampling)
+    if sampled:
+        return hash_sampled(filepath, algorithm, sampling["blocks"], sampling["block_size"]), True
+    return hash_file(filepath, algorithm, buffer_size), False
+
+
+def _hash_entry(filepath: str, algorithm: str, buffer_size: int, sampling: Optional[Dict],
+                mode: Optional[str] = None) -> Optional[Tuple[str, Dict]]:
+    """Stat + Hash einer Datei im Baseline-Format"""
+    try:
+        stat = os.stat(filepath)
+    except:
+        return None
+    digest, sampled = hash_with_mode(filepath, stat.st_size, algorithm, buffer_size, sampling, mode)
+    return filepath, {
+        "hash": digest,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "inode": stat.st_ino,
+        "ctime": stat.st_ctime,
+        "sampled": sampled
+    }
+
+
+def _hash_batch(items: List[Tuple[str, Optional[str]]], algorithm: str, buffer_size: int,
+                sampling: Optional[Dict]) -> List[Optional[Tuple[str, Dict]]]:
+    """Worker: verarbeite einen Block von (pfad, modus)"""
+    return [_hash_entry(p, algorithm, buffer_size, sampling, mode) for p, mode in items]
+
+
+def walk_sorted(directories: Iterable[str], profile=None) -> Iterator[Tuple[str, os.stat_result]]:
+    """Liefere (pfad, stat) aller Dateien in Schlüsselreihenfolge der Baseline
+
+    Tiefensuche über nach Namen sortierte Einträge; wie os.walk werden
+    Symlinks auf Verzeichnisse nicht verfolgt und nicht als Datei gezählt.
+    Mit ScanProfile werden ausgeschlossene Verzeichnisse gar nicht betreten.
+    """
+    roots = sorted((str(Path(d)) for d in directories),
+                   key=lambda r: os.fsencode(r).replace(os.fsencode(os.sep), b"\0"))
+    walked = []
+    for root in roots:
+        if any(root == w or root.startswith(w.rstrip(os.sep) + os.sep) for w in walked):
+            continue
+        walked.append(root)
+        if profile is not None and profile.prune_dir(root, os.path.basename(root)):
+            continue
+        try:
+            device = os.stat(root).st_dev
+        except OSError:
+            continue
+        if os.path.isdir(root):
+            one_fs = device if profile is not None and profile.one_filesystem else None
+            yield from _walk_dir(root, profile, one_fs)
+
+
+def _walk_dir(directory: str, profile, device: Optional[int]) -> Iterator[Tuple[str, os.stat_result]]:
+    try:
+        with os.scandir(directory) as it:
+            # Nach Bytes sortiert wie der Baseline-Schlüssel (auch für nicht dekodierbare Namen)
+            entries = sorted(it, key=lambda e: os.fsencode(e.name))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            if entry.is_symlink():
+                continue
+            if profile is not None and profile.prune_dir(entry.path, entry.name):
+                continue
+            if device is not None:
+                try:
+                    if entry.stat(follow_symlinks=False).st_dev != device:
+                        continue
+                except OSError:
+                    continue
+            yield from _walk_dir(entry.path, profile, device)
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if profile is None or profile.accept_file(entry.path, entry.name, stat):
+            yield entry.path, stat
+
+
+def walk_files(directories: Iterable[str], profile=None) -> Iterator[str]:
+    """Liefere alle Dateien unterhalb der Verzeichnisse"""
+    for path, stat in walk_sorted(directories, profile):
+        yield path
+
+
+class ProgressTracker:
+    """Fortschritt für Integritäts-Operationen (Dateien, Bytes, ETA, aktuelles Verzeichnis)"""
+
+    def __init__(self, callback: Callable[[Dict], None] = None, total_files: int = 0,
+                 total_bytes: int = 0, interval: float = 0.5):
+        self.callback = callback
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.files = 0
+        self.bytes = 0
+        self.current_path = ""
+        self.started = time.monotonic()
+        self._last_report = 0.0
+
+    def update(self, path: str, size: int):
+        self.files += 1
+        self.bytes += size or 0
+        self.current_path = path
+        if self.callback and time.monotonic() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self):
+        """Rufe den Callback mit dem aktuellen Stand auf"""
+        self._last_report = time.monotonic()
+        if self.callback:
+            try:
+                self.callback(self.stats())
+            except:
+                pass
+
+    def stats(self) -> Dict:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        files_per_sec = self.files / elapsed
+        bytes_per_sec = self.bytes / elapsed
+
+        eta = None
+        if self.total_bytes and bytes_per_sec:
+            eta = max(self.total_bytes - self.bytes, 0) / bytes_per_sec
+        elif self.total_files and files_per_sec:
+            eta = max(self.total_files - self.files, 0) / files_per_sec
+
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "total_files": self.total_files,
+            "total_bytes": self.total_bytes,
+            "current_dir": os.path.dirname(self.current_path),
+            "elapsed": elapsed,
+            "files_per_sec": files_per_sec,
+            "bytes_per_sec": bytes_per_sec,
+            "eta": eta
+        }
+
+
+class HashEngine:
+    """Producer/Consumer-Pipeline: Verzeichnis-Walk verteilt Dateien auf einen Prozess-Pool"""
+
+    def __init__(self, workers: int = None, buffer_size: int = READ_BUFFER,
+                 batch_size: int = BATCH_SIZE, progress: Callable[[Dict], None] = None,
+                 progress_interval: float = 1.0, algorithm: str = EVIDENCE_ALGORITHM,
+                 sampling: Dict = None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.algorithm = algorithm
+        # {"threshold", "blocks", "block_size"}: große Dateien nur stichprobenartig hashen
+        self.sampling = sampling
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.files = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+
+    def stats(self) -> Dict:
+        """Aktueller Fortschritt inkl. Durchsatz"""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "elapsed": elapsed,
+            "files_per_sec": self.files / elapsed,
+            "bytes_per_sec": self.bytes / elapsed
+        }
+
+    def _account(self, info: Dict, force: bool = False):
+        if info is not None:
+            self.files += 1
+            self.bytes += info["size"]
+        if self.progress:
+            now = time.monotonic()
+            if force or now - self._last_report >= self.progress_interval:
+                self._last_report = now
+                try:
+                    self.progress(self.stats())
+                except:
+                    pass
+
+    def pipeline(self) -> "HashPipeline":
+        """Pipeline für schrittweises Einreichen und Abholen von Hash-Aufträgen"""
+        self._reset_stats()
+        return HashPipeline(self)
+
+    def hash_paths(self, paths: Iterable[str]) -> Iterator[Tuple[str, Optional[Dict]]]:
+        """Hashe Pfade; liefert (pfad, info) in Eingabe-Reihenfolge, info=None wenn nicht lesbar"""
+        with self.pipeline() as pipe:
+            for path in paths:
+                pipe.submit(path)
+                for path, tag, info in pipe.ready():
+                    yield path, info
+            for path, tag, info in pipe.finish():
+                yield path, info
+
+    def hash_tree(self, directories: Iterable[str], profile=None) -> Iterator[Tuple[str, Dict]]:
+        """Hashe alle Dateien der Verzeichnisse (ohne Profil identisch zur seriellen Baseline)"""
+        for path, info in self.hash_paths(walk_files(directories, profile)):
+            if info is not None:
+                yield path, info
+
+
+class HashPipeline:
+    """Offene Hash-Aufträge einer HashEngine
+
+    submit() nimmt Pfade (plus beliebigen tag) entgegen, ready() liefert
+    fertige Ergebnisse ohne zu blockieren – außer die Anzahl offener
+    Aufträge erreicht das Limit – und finish() wartet auf den Rest.
+    Ergebnisse kommen immer in Einreichungs-Reihenfolge.
+    """
+
+    def __init__(self, engine: HashEngine):
+        self.engine = engine
+        self.batch: List[Tuple[str, object, Optional[str]]] = []
+        self.pending = deque()
+        self.done = deque()
+        # Begrenzte Anzahl offener Aufträge, damit der Producer nicht davonläuft
+        self.max_pending = engine.workers * 4
+        self.pool = ProcessPoolExecutor(max_workers=engine.workers) if engine.workers > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+        self.engine._account(None, force=True)
+
+    def submit(self, path: str, tag=None, mode: str = None):
+        """Reiche einen Pfad ein; mode erzwingt MODE_FULL/MODE_SAMPLED"""
+        engine = self.engine
+        if self.pool is None:
+            entry = _hash_entry(path, engine.algorithm, engine.buffer_size, engine.sampling, mode)
+            self.done.append((path, tag, entry[1] if entry else None))
+            return
+        self.batch.append((path, tag, mode))
+        if len(self.batch) >= self.engine.batch_size:
+            self._submit_batch()
+
+    def _submit_batch(self):
+        if self.batch:
+            items = [(p, mode) for p, t, mode in self.batch]
+            self.pending.append((self.batch, self.pool.submit(
+                _hash_batch, items, self.engine.algorithm, self.engine.buffer_size,
+                self.engine.sampling)))
+            self.batch = []
+
+    def _collect(self, block: bool):
+        while self.pending and (block or self.pending[0][1].done()
+                                or len(self.pending) >= self.max_pending):
+            batch, future = self.pending.popleft()
+            for (path, tag, mode), entry in zip(batch, future.result()):
+                self.done.append((path, tag, entry[1] if entry else None))
+
+    def ready(self) -> Iterator[Tuple[str, object, Optional[Dict]]]:
+        """Bereits fertige Ergebnisse"""
+        self._collect(block=False)
+        while self.done:
+            path, tag, info = self.done.popleft()
+            self.engine._account(info)
+            yield path, tag, info
+
+    def finish(self) -> Iterator[Tuple[str, object, Optional[Dict]]]:
+        """Restliche Ergebnisse (blockierend)"""
+        if self.pool is not None:
+            self._submit_batch()
+            self._collect(block=True)
+        yield from self.ready()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Parallele Reverse-DNS-Auflösung mit persistentem TTL-Cache"""
+
+import json
+import math
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+
+# Gültigkeit gefundener bzw. fehlender PTR-Einträge in Sekunden
+POSITIVE_TTL = 6 * 3600
+NEGATIVE_TTL = 15 * 60
+
+
+def _lookup(ip: str) -> str:
+    try:
+        return socket.gethostbyaddr(ip)[0]
+    except (socket.herror, socket.gaierror):
+        # Kein PTR-Eintrag: negatives Ergebnis
+        return ""
+
+
+class HostnameResolver:
+    """Reverse-DNS für viele Adressen gleichzeitig
+
+    Lookups laufen in einem begrenzten Thread-Pool. Nach Ablauf der Frist
+    liefert `resolve_many` für offene Adressen "" zurück; die Lookups
+    laufen weiter und landen im Cache, so dass der nächste Scan sie hat.
+    Positive und negative Ergebnisse werden mit TTL in `cache_file`
+    gespeichert.
+    """
+
+    def __init__(self, cache_file: Path, workers: int = 32, timeout: float = 2.0,
+                 ttl: int = POSITIVE_TTL, negative_ttl: int = NEGATIVE_TTL):
+        self.cache_file = Path(cache_file)
+        self.workers = workers
+        self.timeout = timeout
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # Reentrant: ein bereits fertiger Lookup ruft _store direkt in submit auf
+        self.lock = threading.RLock()
+        self.cache: Dict[str, list] = self._load()
+        self.dirty = False
+        self.inflight = {}
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rdns")
+
+    def _load(self) -> Dict[str, list]:
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        now = time.time()
+        return {ip: entry for ip, entry in data.items() if entry[1] > now}
+
+    def save(self):
+        """Cache atomar schreiben (nur bei Änderungen)"""
+        with self.lock:
+            if not self.dirty:
+                return
+            now = time.time()
+            data = {ip: entry for ip, entry in self.cache.items() if entry[1] > now}
+            self.dirty = False
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_file.with_suffix(".tmp")
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.cache_file)
+
+    def cached(self, ip: str) -> Optional[str]:
+        """Gültiger Cache-Eintrag oder None"""
+        entry = self.cache.get(ip)
+        if entry is not None and entry[1] > time.time():
+            return entry[0]
+        return None
+
+    def _store(self, ip: str, future):
+        try:
+            hostname = future.result()
+        except Exception:
+            hostname = ""
+        ttl = self.ttl if hostname else self.negative_ttl
+        with self.lock:
+            self.cache[ip] = [hostname, time.time() + ttl]
+            self.inflight.pop(ip, None)
+            self.dirty = True
+
+    def submit(self, ip: str):
+        """Lookup im Hintergrund starten (bzw. laufenden wiederverwenden)"""
+        with self.lock:
+            future = self.inflight.get(ip)
+            if future is None:
+                # Hängende Lookups nicht doppelt starten
+                future = self.pool.submit(_lookup, ip)
+                self.inflight[ip] = future
+                future.add_done_callback(lambda f, ip=ip: self._store(ip, f))
+        return future
+
+    def resolve_many(self, ips: Iterable[str]) -> Dict[str, str]:
+        """Hostnamen für alle Adressen (leer bei fehlendem PTR oder Zeitüberschreitung)"""
+        result = {}
+        futures = {}
+        for ip in ips:
+            hostname = self.cached(ip)
+            if hostname is not None:
+                result[ip] = hostname
+            elif ip not in futures:
+                futures[ip] = self.submit(ip)
+        if futures:
+            # Frist je Lookup; bei mehr Adressen als Workern laufen sie in Wellen
+            waves = math.ceil(len(futures) / self.workers)
+            wait(futures.values(), timeout=self.timeout * waves)
+            for ip, future in futures.items():
+                result[ip] = future.result() if future.done() and not future.exception() else ""
+        self.save()
+        return result
+
+    def resolve(self, ip: str) -> str:
+        return self.resolve_many([ip]).get(ip, "")
+
+    def close(self):
+        """Pool beenden (wartende Lookups verwerfen) und Cache sichern"""
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.save()
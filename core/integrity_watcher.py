@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Echtzeit-Integritätsüberwachung über inotify"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from .baseline_store import BaselineStore, stat_unchanged
+from .digests import EVIDENCE_ALGORITHM, READ_BUFFER
+from .hash_engine import MODE_FULL, MODE_SAMPLED, hash_with_mode
+from .scan_profiles import ScanProfile
+
+
+# inotify-Konstanten (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+# Gemerkte gemeldete Änderungen; die ältesten fallen heraus (und würden
+# bei erneuter Prüfung noch einmal gemeldet)
+MAX_REPORTED = 10000
+
+
+class Inotify:
+    """Minimaler inotify-Wrapper über ctypes"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.watches: Dict[int, str] = {}
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self.watches[wd] = path
+        return wd
+
+    def read_events(self, timeout: float) -> List[tuple]:
+        """Lies anstehende Events: Liste von (pfad, mask)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if mask & IN_Q_OVERFLOW or directory is None:
+                events.append((None, mask))
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            events.append((path, mask))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class IntegrityWatcher:
+    """Überwacht Baseline-Verzeichnisse und hasht nur geänderte Dateien neu
+
+    Events werden pro Pfad gesammelt und erst verarbeitet, wenn für
+    `settle` Sekunden Ruhe ist (Editoren schreiben oft mehrfach bzw. über
+    temporäre Dateien). Läuft die Kernel-Queue über, werden die
+    betroffenen Verzeichnisse per Stat-Vergleich nachgeprüft, höchstens
+    `rescan_batch` Verzeichnisse pro Durchlauf.
+    """
+
+    def __init__(self, logger, baseline_file, directories: List[str],
+                 callback: Callable[[Dict], None] = None, settle: float = 0.5,
+                 rescan_batch: int = 200, poll_interval: float = 300.0):
+        self.logger = logger
+        self.baseline_file = baseline_file
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.callback = callback
+        self.settle = settle
+        self.rescan_batch = rescan_batch
+        self.poll_interval = poll_interval
+
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.inotify: Optional[Inotify] = None
+        self.pending: Dict[str, float] = {}
+        self.rescan_dirs: List[str] = []
+        self.reported: Dict[str, str] = OrderedDict()
+        self.algorithm = EVIDENCE_ALGORITHM
+        self.sampling = None
+        self.profile: Optional[ScanProfile] = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def _run(self):
+        store = BaselineStore(self.baseline_file)
+        self.algorithm = store.get_meta("algorithm", EVIDENCE_ALGORITHM)
+        self.sampling = store.get_meta("sampling")
+        profile = store.get_meta("profile")
+        self.profile = ScanProfile.from_dict(profile) if profile else None
+        try:
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError) as e:
+                self.logger.log("WARNING", f"inotify nicht verfügbar ({e}), nutze periodischen Vergleich")
+                self._poll_loop(store)
+                return
+
+            for directory in self.directories:
+                self._watch_tree(directory)
+            self.logger.log("INFO", f"Integritäts-Watch aktiv: {len(self.inotify.watches)} Verzeichnisse")
+
+            while self.running:
+                for path, mask in self.inotify.read_events(self.settle):
+                    self._handle_event(path, mask)
+                self._flush(store)
+        finally:
+            if self.inotify:
+                self.inotify.close()
+                self.inotify = None
+            store.close()
+
+    def _poll_loop(self, store: BaselineStore):
+        """Fallback ohne inotify: regelmäßiger Stat-Vergleich aller Verzeichnisse"""
+        while self.running:
+            self.rescan_dirs = [d for d in self.directories]
+            while self.rescan_dirs and self.running:
+                self._rescan(store)
+            deadline = time.monotonic() + self.poll_interval
+            while self.running and time.monotonic() < deadline:
+                time.sleep(min(1.0, self.settle))
+
+    def _watch_tree(self, directory: str):
+        """Registriere Watches für ein Verzeichnis und alle Unterverzeichnisse"""
+        for root, dirs, files in os.walk(directory):
+            if self.profile is not None:
+                dirs[:] = [d for d in dirs if not self.profile.prune_dir(os.path.join(root, d), d)]
+            try:
+                self.inotify.add_watch(root)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    self.logger.log("WARNING", "inotify-Limit erreicht (fs.inotify.max_user_watches)")
+                    return
+                dirs[:] = []
+
+    def _handle_event(self, path: Optional[str], mask: int):
+        now = time.monotonic()
+        if path is None:
+            self.logger.log("WARNING", "inotify-Queue übergelaufen, prüfe Verzeichnisse nach")
+            self.rescan_dirs = list(self.directories)
+            return
+        if self._excluded(path):
+            return
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path)
+                self.rescan_dirs.append(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.rescan_dirs.append(path)
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            self.rescan_dirs.append(path)
+            return
+        self.pending[path] = now
+
+    def _excluded(self, path: str) -> bool:
+        """Pfad liegt in einem vom Scan-Profil ausgeschlossenen Bereich"""
+        if self.profile is None:
+            return False
+        return self.profile.prune_dir(path, os.path.basename(path))
+
+    def _flush(self, store: BaselineStore):
+        """Verarbeite Pfade, für die seit `settle` Sekunden keine Events kamen"""
+        now = time.monotonic()
+        ready = [p for p, t in self.pending.items() if now - t >= self.settle]
+        for path in ready:
+            del self.pending[path]
+            self._check_file(store, path)
+        if self.rescan_dirs:
+            self._rescan(store)
+
+    def _rescan(self, store: BaselineStore):
+        """Begrenzter Nachlauf: Stat-Vergleich einiger Verzeichnisse"""
+        batch = self.rescan_dirs[:self.rescan_batch]
+        self.rescan_dirs = self.rescan_dirs[self.rescan_batch:]
+        for directory in batch:
+            if not os.path.isdir(directory):
+                # Ganzer Teilbaum verschwunden
+                for path, info in store.iter_tree(directory):
+                    self._check_file(store, path, info)
+                continue
+            seen = set()
+            for path, info in store.iter_dir(directory):
+                seen.add(path)
+                self._check_file(store, path, info)
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if self._excluded(entry.path):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            self.rescan_dirs.append(entry.path)
+                        elif entry.path not in seen and entry.is_file():
+                            self._check_file(store, entry.path)
+            except OSError:
+                pass
+
+    def _check_file(self, store: BaselineStore, path: str, info: Dict = None):
+        """Vergleiche eine Datei mit ihrem Baseline-Eintrag"""
+        if info is None:
+            info = store.get(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+
+        if info is None:
+            change = None
+            if stat is not None and os.path.isfile(path):
+                accepted = self.profile is None or self.profile.accept_file(
+                    path, os.path.basename(path), stat)
+                change = "ADDED" if accepted else None
+        elif stat is None:
+            change = "DELETED"
+        elif stat_unchanged(stat, info):
+            change = None
+        else:
+            mode = MODE_SAMPLED if info.get("sampled") else MODE_FULL
+            digest, sampled = hash_with_mode(path, stat.st_size, self.algorithm, READ_BUFFER,
+                                             self.sampling, mode)
+            change = "MODIFIED" if digest != info["hash"] else None
+
+        # Jede Änderung nur einmal melden, bis sich der Zustand wieder ändert
+        if change is None:
+            self.reported.pop(path, None)
+            return
+        if self.reported.get(path) == change:
+            self.reported.move_to_end(path)
+            return
+        self.reported[path] = change
+        self.reported.move_to_end(path)
+        while len(self.reported) > MAX_REPORTED:
+            self.reported.popitem(last=False)
+        self._emit({"type": change, "file": path, "timestamp": time.time()})
+
+    def _emit(self, change: Dict):
+        self.logger.log("ALERT", f"Integrität: {change['type']} {change['file']}")
+        if self.callback:
+            try:
+                self.callback(change)
+            except:
+                pass
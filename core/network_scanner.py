@@ -1,107 +1,200 @@
 #!/usr/bin/env python3
 """Netzwerk-Scanner Modul"""
 
-import socket
+import ipaddress
 import subprocess
-import threading
-from typing import List, Dict, Optional
+from concurrent.futures import wait
+from pathlib import Path
+from typing import Iterator, List, Dict, Optional, Tuple
 import netifaces
-import nmap
-from scapy.all import ARP, Ether, srp
-import requests
+
+from .arp_discovery import DEFAULT_RATE, DEFAULT_RETRIES, arp_stream_interfaces
+from .hostname_resolver import HostnameResolver
+from .nmap_scheduler import NmapScheduler
+from .oui_db import VendorResolver
+
+
+# Größtes Netz, das je Interface vollständig abgesucht wird (/16 = 65534 Hosts)
+MAX_SCAN_PREFIX = 16
+
+DEEP_SCAN_ARGUMENTS = "-sV -O -T4"
 
 
 class NetworkScanner:
     """Netzwerk-Scanner für lokales Netzwerk"""
     
-    def __init__(self, logger):
+    def __init__(self, logger, rate: float = DEFAULT_RATE, retries: int = DEFAULT_RETRIES,
+                 nmap_scheduler: NmapScheduler = None):
         self.logger = logger
-        
+        self.nmap = nmap_scheduler or NmapScheduler()
+        self.rate = rate
+        self.retries = retries
+        self.resolver = HostnameResolver(Path.home() / ".cyberguardian" / "dns_cache.json")
+        self.vendors = VendorResolver(Path.home() / ".cyberguardian" / "oui")
+
+    def get_networks(self) -> List[Tuple[str, ipaddress.IPv4Network]]:
+        """IPv4-Netze aller aktiven Interfaces (echte Präfixe, ohne Loopback)
+
+        Netze größer als MAX_SCAN_PREFIX werden auf den Block um die eigene
+        Adresse begrenzt.
+        """
+        networks = []
+        for iface in netifaces.interfaces():
+            for addr in netifaces.ifaddresses(iface).get(netifaces.AF_INET, []):
+                try:
+                    interface = ipaddress.ip_interface(f"{addr['addr']}/{addr['netmask']}")
+                except (KeyError, ValueError):
+                    continue
+                network = interface.network
+                if interface.ip.is_loopback or interface.ip.is_link_local or network.prefixlen >= 31:
+                    continue
+                if network.prefixlen < MAX_SCAN_PREFIX:
+                    network = ipaddress.ip_interface(f"{interface.ip}/{MAX_SCAN_PREFIX}").network
+                if (iface, network) not in networks:
+                    networks.append((iface, network))
+        return networks
+
+    def get_local_addresses(self) -> List[str]:
+        """Eigene IPv4-Adressen aller Interfaces"""
+        addresses = []
+        for iface in netifaces.interfaces():
+            for addr in netifaces.ifaddresses(iface).get(netifaces.AF_INET, []):
+                if 'addr' in addr:
+                    addresses.append(addr['addr'])
+        return addresses
+
     def get_network_range(self) -> str:
-        """Ermittle Netzwerk-Range"""
+        """Ermittle Netzwerk-Range (Präfix des Interfaces am Default-Gateway)"""
         try:
-            gw = netifaces.gateways()['default'][netifaces.AF_INET]
-            gateway_ip = gw[0]
+            gateway_ip, gateway_iface = netifaces.gateways()['default'][netifaces.AF_INET][:2]
+            for iface, network in self.get_networks():
+                if iface == gateway_iface and ipaddress.ip_address(gateway_ip) in network:
+                    return str(network)
             parts = gateway_ip.split('.')
             return f"{parts[0]}.{parts[1]}.{parts[2]}.0/24"
         except:
             return "192.168.1.0/24"
-            
-    def scan_network(self, network_range: str = None) -> List[Dict]:
-        """Scanne Netzwerk nach Geräten"""
+
+    def _targets(self, network_range: str = None) -> List[Tuple[str, ipaddress.IPv4Network]]:
+        """(Interface, Netz)-Paare: alle Interfaces oder das zur Range passende"""
         if not network_range:
-            network_range = self.get_network_range()
+            return self.get_networks()
+        network = ipaddress.ip_network(network_range, strict=False)
+        for iface, own in self.get_networks():
+            if network.overlaps(own):
+                return [(iface, network)]
+        return [(None, network)]
             
-        self.logger.log("INFO", f"Scanne Netzwerk: {network_range}")
-        devices = []
-        
+    def scan_network(self, network_range: str = None) -> List[Dict]:
+        """Scanne Netzwerk nach Geräten (ohne Range: alle Interfaces)"""
+        devices = {}
+        for device in self.scan_network_stream(network_range):
+            devices[device["ip"]] = device
+        return list(devices.values())
+
+    def scan_network_stream(self, network_range: str = None, rate: float = None,
+                            retries: int = None) -> Iterator[Dict]:
+        """Scanne Netzwerk und liefere jedes Gerät, sobald es antwortet
+
+        Ohne Range werden die Netze aller Interfaces parallel abgefragt;
+        `rate` (Pakete/s) ist das gemeinsame Budget. Hostnamen, die noch
+        nicht im Cache sind, werden im Hintergrund aufgelöst; das Gerät
+        wird dann mit gleicher IP erneut geliefert.
+        """
+        rate = rate or self.rate
+        retries = self.retries if retries is None else retries
+        lookups = {}
+        errors = []
         try:
-            arp = ARP(pdst=network_range)
-            ether = Ether(dst="ff:ff:ff:ff:ff:ff")
-            packet = ether/arp
-            
-            result = srp(packet, timeout=3, verbose=0)[0]
-            
-            for sent, received in result:
+            networks = self._targets(network_range)
+            self.logger.log("INFO", "Scanne Netzwerk (live): " + ", ".join(
+                f"{network} ({iface or 'Standard'})" for iface, network in networks))
+            for iface, ip, mac in arp_stream_interfaces(networks, rate, retries, errors,
+                                                        exclude=self.get_local_addresses()):
+                hostname = self.resolver.cached(ip)
                 device = {
-                    "ip": received.psrc,
-                    "mac": received.hwsrc,
-                    "hostname": self.get_hostname(received.psrc),
-                    "vendor": self.get_vendor(received.hwsrc),
+                    "ip": ip,
+                    "mac": mac,
+                    "hostname": hostname or "",
+                    "vendor": self.get_vendor(mac),
+                    "interface": iface or "",
                     "ports": "",
                     "os": ""
                 }
-                devices.append(device)
-                
+                if hostname is None:
+                    lookups[ip] = (self.resolver.submit(ip), device)
+                yield dict(device)
+                yield from self._resolved_hostnames(lookups)
+            if lookups:
+                wait([future for future, _ in lookups.values()], timeout=self.resolver.timeout)
+                yield from self._resolved_hostnames(lookups)
         except Exception as e:
             self.logger.log("ERROR", f"Scan-Fehler: {e}")
-            
-        return devices
+        finally:
+            for iface, e in errors:
+                self.logger.log("ERROR", f"Scan-Fehler auf {iface}: {e}")
+            self.resolver.save()
+
+    def _resolved_hostnames(self, lookups: Dict) -> Iterator[Dict]:
+        """Geräte, deren Hostname inzwischen aufgelöst wurde"""
+        for ip in [ip for ip, (future, _) in lookups.items() if future.done()]:
+            future, device = lookups.pop(ip)
+            hostname = future.result() if not future.exception() else ""
+            if hostname:
+                device["hostname"] = hostname
+                yield dict(device)
         
     def deep_scan(self, ip: str) -> Dict:
         """Tiefenscan eines Geräts"""
-        result = {
-            "ip": ip,
-            "ports": [],
-            "os": "",
-            "services": []
-        }
-        
+        for result in self.deep_scan_many([ip]):
+            return result
+        return {"ip": ip, "ports": [], "os": "", "services": []}
+
+    def deep_scan_many(self, ips: List[str]) -> Iterator[Dict]:
+        """Tiefenscan vieler Geräte (gebündelt, parallel, gecacht), je Gerät sobald fertig"""
+        errors = []
         try:
-            nm = nmap.PortScanner()
-            nm.scan(ip, arguments="-sV -O -T4")
-            
-            if ip in nm.all_hosts():
-                host = nm[ip]
-                
-                if 'osmatch' in host and host['osmatch']:
-                    result['os'] = host['osmatch'][0].get('name', 'Unknown')
-                    
-                for proto in host.all_protocols():
-                    for port in host[proto].keys():
-                        port_info = host[proto][port]
-                        result['ports'].append({
-                            'port': port,
-                            'state': port_info['state'],
-                            'service': port_info.get('name', ''),
-                            'version': port_info.get('version', '')
-                        })
-                        
+            for host in self.nmap.scan(ips, arguments=DEEP_SCAN_ARGUMENTS, errors=errors):
+                yield {
+                    "ip": host["ip"],
+                    "ports": [{
+                        'port': port['port'],
+                        'state': port['state'],
+                        'service': port['service'],
+                        'version': port['version']
+                    } for port in host["ports"]],
+                    "os": host["os"],
+                    "services": []
+                }
         except Exception as e:
             self.logger.log("ERROR", f"Deep Scan Fehler: {e}")
-            
-        return result
+        for targets, e in errors:
+            self.logger.log("ERROR", f"Deep Scan Fehler ({', '.join(targets)}): {e}")
         
     def get_hostname(self, ip: str) -> str:
-        """Hole Hostname für IP"""
+        """Hole Hostname für IP (gecacht, mit Zeitlimit)"""
         try:
-            return socket.gethostbyaddr(ip)[0]
+            return self.resolver.resolve(ip)
         except:
             return ""
             
     def get_vendor(self, mac: str) -> str:
-        """Hole Hersteller für MAC - vereinfachte Version"""
-        return "Unknown"
+        """Hole Hersteller für MAC (offline, aus der OUI-Datenbank)"""
+        try:
+            return self.vendors.lookup(mac) or "Unknown"
+        except Exception as e:
+            self.logger.log("ERROR", f"OUI-Datenbank Fehler: {e}")
+            return "Unknown"
+
+    def close(self):
+        """Reverse-DNS-Pool beenden, offene Lookups verwerfen und Cache sichern"""
+        self.resolver.close()
+
+    def update_vendors(self) -> int:
+        """IEEE-Herstellerlisten herunterladen und OUI-Datenbank neu bauen"""
+        count = self.vendors.update()
+        self.logger.log("INFO", f"OUI-Datenbank aktualisiert: {count} Einträge")
+        return count
             
     def get_arp_table(self) -> List[Dict]:
         """Hole ARP-Tabelle"""
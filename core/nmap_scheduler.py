@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Gebündelte, parallele nmap-Scans mit Ergebnis-Cache"""
+
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Ziele je nmap-Aufruf, gleichzeitige Aufrufe, Gültigkeit im Cache (Sekunden)
+BATCH_SIZE = 16
+MAX_PARALLEL = 2
+CACHE_TTL = 15 * 60
+
+_DONE = object()
+
+
+def parse_host(elem: ET.Element) -> Dict:
+    """<host>-Element der nmap-XML-Ausgabe als Dict"""
+    result = {"ip": "", "state": "", "hostnames": [], "ports": [], "os": ""}
+    status = elem.find("status")
+    if status is not None:
+        result["state"] = status.get("state", "")
+    for address in elem.findall("address"):
+        if address.get("addrtype") in ("ipv4", "ipv6"):
+            result["ip"] = address.get("addr", "")
+        elif address.get("addrtype") == "mac":
+            result["mac"] = address.get("addr", "")
+    for hostname in elem.findall("hostnames/hostname"):
+        result["hostnames"].append(hostname.get("name", ""))
+    for port in elem.findall("ports/port"):
+        state = port.find("state")
+        service = port.find("service")
+        result["ports"].append({
+            "port": int(port.get("portid", 0)),
+            "protocol": port.get("protocol", ""),
+            "state": state.get("state", "") if state is not None else "",
+            "service": service.get("name", "") if service is not None else "",
+            "version": service.get("version", "") if service is not None else "",
+        })
+    osmatch = elem.find("os/osmatch")
+    if osmatch is not None:
+        result["os"] = osmatch.get("name", "Unknown")
+    return result
+
+
+class NmapScheduler:
+    """Verteilt viele Ziele auf gebündelte nmap-Aufrufe
+
+    Ziele mit gleichen Ports und Argumenten laufen zu je `batch_size` in
+    einem nmap-Prozess, höchstens `max_parallel` Prozesse gleichzeitig.
+    Die XML-Ausgabe wird gelesen, während nmap noch läuft; jeder Host
+    wird geliefert, sobald sein Eintrag vollständig ist. Ergebnisse (auch
+    "nicht erreichbar") bleiben `ttl` Sekunden je (Ziel, Ports, Argumente)
+    im Cache; laufende Scans desselben Schlüssels werden mitbenutzt.
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE, max_parallel: int = MAX_PARALLEL,
+                 ttl: float = CACHE_TTL, nmap_path: str = None):
+        self.batch_size = batch_size
+        self.ttl = ttl
+        self.nmap_path = nmap_path or shutil.which("nmap") or "nmap"
+        self.lock = threading.Lock()
+        self.cache: Dict[Tuple, Tuple[float, Dict]] = {}
+        self.inflight: Dict[Tuple, threading.Event] = {}
+        self.slots = threading.BoundedSemaphore(max_parallel)
+
+    def cached(self, target: str, ports: str = None, arguments: str = "") -> Optional[Dict]:
+        with self.lock:
+            entry = self.cache.get((target, ports, arguments))
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def invalidate(self, target: str = None):
+        """Cache leeren (alles oder nur ein Ziel)"""
+        with self.lock:
+            if target is None:
+                self.cache.clear()
+            else:
+                for key in [k for k in self.cache if k[0] == target]:
+                    del self.cache[key]
+
+    def _store(self, key: Tuple, result: Dict):
+        with self.lock:
+            self.cache[key] = (time.monotonic() + self.ttl, result)
+
+    def _command(self, targets: List[str], ports: str, arguments: str) -> List[str]:
+        command = [self.nmap_path, "-oX", "-"] + arguments.split()
+        if ports:
+            command += ["-p", ports]
+        return command + targets
+
+    def _read_hosts(self, stream) -> Iterator[Dict]:
+        """Hosts aus der XML-Ausgabe, sobald ihr Element geschlossen ist
+
+        os.read liefert, was gerade in der Pipe liegt; iterparse würde auf
+        volle Puffer warten.
+        """
+        parser = ET.XMLPullParser(events=("end",))
+        fd = stream.fileno()
+        while True:
+            chunk = os.read(fd, 65536)
+            if chunk:
+                parser.feed(chunk)
+            else:
+                parser.close()
+            for _, elem in parser.read_events():
+                if elem.tag == "host":
+                    yield parse_host(elem)
+                    elem.clear()
+            if not chunk:
+                return
+
+    def _run_batch(self, targets: List[str], ports: str, arguments: str, out: queue.Queue,
+                   cancel: threading.Event, procs: list, errors: list):
+        """Einen nmap-Prozess ausführen und Hosts einzeln weiterreichen"""
+        pending = set(targets)
+        proc = None
+        # stderr in eine Datei, damit eine volle Pipe nmap nicht blockiert
+        stderr = tempfile.TemporaryFile()
+        try:
+            with self.slots:
+                with self.lock:
+                    if cancel.is_set():
+                        return
+                    proc = subprocess.Popen(self._command(targets, ports, arguments),
+                                            stdout=subprocess.PIPE, stderr=stderr)
+                    procs.append(proc)
+                for result in self._read_hosts(proc.stdout):
+                    # Ziel kann IP oder vom Benutzer angegebener Hostname sein
+                    target = result["ip"] if result["ip"] in pending else next(
+                        (name for name in result["hostnames"] if name in pending), None)
+                    if target is None:
+                        continue
+                    pending.discard(target)
+                    self._store((target, ports, arguments), result)
+                    out.put(result)
+                returncode = proc.wait()
+                if cancel.is_set():
+                    return
+                if returncode != 0:
+                    stderr.seek(0)
+                    raise RuntimeError(f"nmap beendet mit {returncode}: "
+                                       f"{stderr.read().decode(errors='replace').strip()}")
+            # Nicht gemeldete Ziele sind nicht erreichbar
+            for target in pending:
+                result = {"ip": target, "state": "down", "hostnames": [], "ports": [], "os": ""}
+                self._store((target, ports, arguments), result)
+                out.put(result)
+        except Exception as e:
+            if not cancel.is_set():
+                errors.append((targets, e))
+        finally:
+            stderr.close()
+            if proc is not None and proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            with self.lock:
+                for target in targets:
+                    event = self.inflight.pop((target, ports, arguments), None)
+                    if event is not None:
+                        event.set()
+            out.put(_DONE)
+
+    def scan(self, targets: Iterable[str], ports: str = None, arguments: str = "-sV -T4",
+             errors: Optional[list] = None) -> Iterator[Dict]:
+        """Ergebnisse je Ziel, Cache-Treffer sofort, übrige sobald nmap sie meldet
+
+        Fehler einzelner Bündel landen in `errors` (Liste von (Ziele, Exception)).
+        """
+        errors = errors if errors is not None else []
+        hits, todo, waiting = [], [], []
+        for target in dict.fromkeys(targets):
+            result = self.cached(target, ports, arguments)
+            if result is not None:
+                hits.append(result)
+                continue
+            key = (target, ports, arguments)
+            with self.lock:
+                event = self.inflight.get(key)
+                if event is None:
+                    self.inflight[key] = threading.Event()
+                    todo.append(target)
+                else:
+                    waiting.append((target, event))
+
+        out = queue.Queue()
+        cancel = threading.Event()
+        procs = []
+        batches = [todo[i:i + self.batch_size] for i in range(0, len(todo), self.batch_size)]
+        for batch in batches:
+            threading.Thread(target=self._run_batch, daemon=True,
+                             args=(batch, ports, arguments, out, cancel, procs, errors)).start()
+        try:
+            yield from hits
+            running = len(batches)
+            while running:
+                item = out.get()
+                if item is _DONE:
+                    running -= 1
+                    continue
+                yield item
+            # Von anderen Aufrufen gerade gescannte Ziele
+            for target, event in waiting:
+                event.wait()
+                result = self.cached(target, ports, arguments)
+                if result is not None:
+                    yield result
+        finally:
+            # Abbruch durch den Aufrufer: laufende nmap-Prozesse beenden
+            with self.lock:
+                cancel.set()
+                for proc in procs:
+                    if proc.poll() is None:
+                        proc.kill()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Offline-Herstellerdatenbank (IEEE MA-L/MA-M/MA-S) als mmap-Präfixindex"""
+
+import csv
+import mmap
+import os
+import struct
+import sys
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import requests
+
+
+# Datei: Kopf, je Präfixlänge ein sortiertes uint64-Schlüssel-Array, danach
+# die zugehörigen uint32-Namens-Offsets und zuletzt die Namen (\0-getrennt,
+# dedupliziert). Die Schlüssel-Arrays liegen 8-Byte-ausgerichtet und werden
+# direkt als memoryview durchsucht.
+MAGIC = b"OUI1"
+HEADER = struct.Struct("<4sIII")
+
+# Längste Zuteilung zuerst: MA-S (36 Bit) vor MA-M (28) vor MA-L (24)
+PREFIX_BITS = (36, 28, 24)
+REGISTRIES = {"MA-S": 36, "MA-M": 28, "MA-L": 24}
+
+REGISTRY_URLS = {
+    "oui.csv": "https://standards-oui.ieee.org/oui/oui.csv",
+    "mam.csv": "https://standards-oui.ieee.org/oui28/mam.csv",
+    "oui36.csv": "https://standards-oui.ieee.org/oui36/oui36.csv",
+}
+
+# Cache von mac-vendor-lookup ("AABBCC:Hersteller"), falls vorhanden
+MAC_VENDOR_LOOKUP_CACHE = Path.home() / ".cache" / "mac-vendors.txt"
+
+
+def mac_to_int(mac: str) -> int:
+    """MAC in beliebiger Schreibweise (aa:bb.., aa-bb.., aabb.ccdd..) als 48-Bit-Zahl"""
+    digits = mac.replace(":", "").replace("-", "").replace(".", "")
+    if len(digits) != 12:
+        raise ValueError(f"Ungültige MAC-Adresse: {mac}")
+    return int(digits, 16)
+
+
+def _read_ieee_csv(path: Path) -> Iterator[Tuple[int, int, str]]:
+    with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        for row in csv.DictReader(f):
+            bits = REGISTRIES.get(row.get("Registry", ""))
+            assignment = row.get("Assignment", "")
+            if bits is None or len(assignment) * 4 != bits:
+                continue
+            yield bits, int(assignment, 16), row.get("Organization Name", "").strip()
+
+
+def _read_vendor_txt(path: Path) -> Iterator[Tuple[int, int, str]]:
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            prefix, _, name = line.rstrip("\n").partition(":")
+            if len(prefix) == 6 and name:
+                try:
+                    yield 24, int(prefix, 16), name.strip()
+                except ValueError:
+                    continue
+
+
+def read_sources(sources: Iterable[Path]) -> Iterator[Tuple[int, int, str]]:
+    """(Bits, Präfix, Hersteller) aus IEEE-CSVs bzw. mac-vendor-lookup-Cache"""
+    for path in sources:
+        path = Path(path)
+        if path.suffix == ".csv":
+            yield from _read_ieee_csv(path)
+        else:
+            yield from _read_vendor_txt(path)
+
+
+def compile_registry(sources: Iterable[Path], output: Path) -> int:
+    """Quellen in die Binärdatei übersetzen (atomar), Anzahl Einträge"""
+    tables: Dict[int, Dict[int, str]] = {bits: {} for bits in PREFIX_BITS}
+    for bits, prefix, name in read_sources(sources):
+        # Spätere Quellen (z.B. IEEE nach dem mac-vendor-lookup-Cache) gewinnen
+        tables[bits][prefix] = name
+
+    names = bytearray()
+    name_offsets: Dict[str, int] = {}
+    keys = b""
+    offsets = b""
+    for bits in PREFIX_BITS:
+        items = sorted(tables[bits].items())
+        keys += struct.pack(f"<{len(items)}Q", *(prefix for prefix, _ in items))
+        refs = []
+        for _, name in items:
+            if name not in name_offsets:
+                name_offsets[name] = len(names)
+                names += name.encode() + b"\0"
+            refs.append(name_offsets[name])
+        offsets += struct.pack(f"<{len(refs)}I", *refs)
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_suffix(".tmp")
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, *(len(tables[bits]) for bits in PREFIX_BITS)))
+        f.write(keys)
+        f.write(offsets)
+        f.write(names)
+    os.replace(tmp, output)
+    return sum(len(t) for t in tables.values())
+
+
+def fetch_registry(directory: Path, timeout: int = 30) -> list:
+    """IEEE-Registerdateien herunterladen (nur auf Anforderung, nie beim Lookup)"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    fetched = []
+    for filename, url in REGISTRY_URLS.items():
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        tmp = directory / (filename + ".tmp")
+        with open(tmp, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp, directory / filename)
+        fetched.append(directory / filename)
+    return fetched
+
+
+class _LittleEndianArray:
+    """Nur-Lese-Array aus Little-Endian-Werten für Big-Endian-Rechner
+
+    memoryview.cast liest in nativer Bytereihenfolge; hier wird jeder
+    Zugriff per struct dekodiert (reicht für bisect).
+    """
+
+    def __init__(self, view: memoryview, fmt: str):
+        self.view = view
+        self.item = struct.Struct("<" + fmt)
+        self.count = len(view) // self.item.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> int:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return self.item.unpack_from(self.view, index * self.item.size)[0]
+
+    def release(self):
+        self.view.release()
+
+
+def _array(view: memoryview, fmt: str):
+    """Little-Endian-Array als memoryview (native Reihenfolge passt) oder Wrapper"""
+    if sys.byteorder == "little":
+        return view.cast(fmt)
+    return _LittleEndianArray(view, fmt)
+
+
+class OuiDatabase:
+    """Hersteller-Lookup über die kompilierte Datei (mmap, Binärsuche)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *counts = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            self.mm.close()
+            raise ValueError(f"Keine OUI-Datenbank: {self.path}")
+        view = memoryview(self.mm)
+        self.tables = []
+        pos = HEADER.size
+        key_views = []
+        for count in counts:
+            key_views.append(_array(view[pos:pos + count * 8], "Q"))
+            pos += count * 8
+        for bits, count, keys in zip(PREFIX_BITS, counts, key_views):
+            self.tables.append((48 - bits, keys, _array(view[pos:pos + count * 4], "I")))
+            pos += count * 4
+        self.names_start = pos
+
+    def __len__(self) -> int:
+        return sum(len(keys) for _, keys, _ in self.tables)
+
+    def _name(self, offset: int) -> str:
+        start = self.names_start + offset
+        return self.mm[start:self.mm.find(b"\0", start)].decode()
+
+    def lookup(self, mac: str) -> Optional[str]:
+        """Hersteller zur MAC oder None (längste Zuteilung gewinnt)"""
+        try:
+            value = mac_to_int(mac)
+        except ValueError:
+            return None
+        for shift, keys, offsets in self.tables:
+            prefix = value >> shift
+            pos = bisect_left(keys, prefix)
+            if pos < len(keys) and keys[pos] == prefix:
+                return self._name(offsets[pos])
+        return None
+
+    def close(self):
+        for _, keys, offsets in self.tables:
+            keys.release()
+            offsets.release()
+        self.tables = []
+        self.mm.close()
+
+
+class VendorResolver:
+    """Hersteller-Auflösung aus ~/.cyberguardian/oui
+
+    Liegen dort IEEE-CSVs (oui.csv, mam.csv, oui36.csv) oder gibt es den
+    Cache von mac-vendor-lookup, wird daraus `oui.db` gebaut – neu nur,
+    wenn eine Quelle jünger ist als die Datenbank. `update` lädt die
+    IEEE-Register herunter (nur auf ausdrückliche Anforderung).
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.db_file = self.directory / "oui.db"
+        self.db: Optional[OuiDatabase] = None
+        self.loaded = False
+        # update() tauscht die Datenbank, während Scan-Threads nachschlagen
+        self.lock = threading.Lock()
+
+    def sources(self) -> list:
+        sources = [MAC_VENDOR_LOOKUP_CACHE] if MAC_VENDOR_LOOKUP_CACHE.exists() else []
+        return sources + [self.directory / name for name in REGISTRY_URLS
+                          if (self.directory / name).exists()]
+
+    def _open(self):
+        self.loaded = True
+        sources = self.sources()
+        try:
+            db_mtime = self.db_file.stat().st_mtime
+        except FileNotFoundError:
+            db_mtime = None
+        if sources and (db_mtime is None or any(s.stat().st_mtime > db_mtime for s in sources)):
+            compile_registry(sources, self.db_file)
+        if self.db_file.exists():
+            self.db = OuiDatabase(self.db_file)
+
+    def update(self) -> int:
+        """IEEE-Register laden und Datenbank neu bauen, Anzahl Einträge"""
+        fetch_registry(self.directory)
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+            self._open()
+            return len(self.db) if self.db else 0
+
+    def lookup(self, mac: str) -> Optional[str]:
+        with self.lock:
+            if not self.loaded:
+                self._open()
+            return self.db.lookup(mac) if self.db else None
@@ -6,15 +6,17 @@ import socket
 import psutil
 from typing import List, Dict, Tuple
 import platform
-import nmap
+
+from .nmap_scheduler import NmapScheduler
 
 
 class PortManager:
     """Port-Verwaltung und Scanning"""
     
-    def __init__(self, logger, backup_manager):
+    def __init__(self, logger, backup_manager, nmap_scheduler: NmapScheduler = None):
         self.logger = logger
         self.backup = backup_manager
+        self.nmap = nmap_scheduler or NmapScheduler()
         self.os_type = platform.system()
         
     def get_open_ports(self) -> List[Dict]:
@@ -47,26 +49,29 @@ class PortManager:
         
     def scan_ports(self, target: str, port_range: str = "1-1024") -> List[Dict]:
         """Scanne Ports eines Ziels"""
-        self.logger.log("INFO", f"Port-Scan: {target} ({port_range})")
-        results = []
+        return self.scan_ports_many([target], port_range).get(target, [])
+
+    def scan_ports_many(self, targets: List[str], port_range: str = "1-1024") -> Dict[str, List[Dict]]:
+        """Scanne Ports vieler Ziele (gebündelt, parallel, gecacht)"""
+        self.logger.log("INFO", f"Port-Scan: {', '.join(targets)} ({port_range})")
+        results = {target: [] for target in targets}
+        errors = []
         
         try:
-            nm = nmap.PortScanner()
-            nm.scan(target, port_range, arguments="-sV -T4")
-            
-            if target in nm.all_hosts():
-                for proto in nm[target].all_protocols():
-                    for port in nm[target][proto].keys():
-                        port_info = nm[target][proto][port]
-                        results.append({
-                            "port": port,
-                            "protocol": proto.upper(),
-                            "state": port_info['state'],
-                            "service": port_info.get('name', ''),
-                            "version": port_info.get('version', '')
-                        })
+            for host in self.nmap.scan(targets, port_range, arguments="-sV -T4", errors=errors):
+                key = host["ip"] if host["ip"] in results else next(
+                    (name for name in host["hostnames"] if name in results), host["ip"])
+                results[key] = [{
+                    "port": port["port"],
+                    "protocol": port["protocol"].upper(),
+                    "state": port["state"],
+                    "service": port["service"],
+                    "version": port["version"]
+                } for port in host["ports"]]
         except Exception as e:
             self.logger.log("ERROR", f"Port-Scan Fehler: {e}")
+        for failed, e in errors:
+            self.logger.log("ERROR", f"Port-Scan Fehler ({', '.join(failed)}): {e}")
             
         return results
         
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Nachträgliche Voll-Verifikation stichprobenartig gehashter Dateien"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from .baseline_store import BaselineStore, stat_unchanged
+from .digests import EVIDENCE_ALGORITHM, hash_file
+
+
+# Versuche je Datei, wenn die Baseline gerade gesperrt ist
+MAX_ATTEMPTS = 3
+
+
+class SampleVerifier:
+    """Niedrig priorisierter Hintergrund-Thread, der Stichproben-Hashes durch volle Hashes ersetzt
+
+    Nur Dateien, deren Stat-Daten noch zur Baseline passen, werden
+    übernommen; geänderte Dateien bleiben als "sampled" markiert und
+    fallen beim nächsten Vergleich ohnehin auf.
+    """
+
+    def __init__(self, logger, baseline_file, pause: float = 0.1):
+        self.logger = logger
+        self.baseline_file = baseline_file
+        self.pause = pause
+        self.running = False
+        self.thread = None
+        self.verified = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def _lower_priority(self):
+        """Nur diesen Thread herunterstufen (Linux: Nice-Wert pro Thread)"""
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+    def _run(self):
+        self._lower_priority()
+        self.verified = 0
+        store = BaselineStore(self.baseline_file)
+        try:
+            algorithm = store.get_meta("algorithm", EVIDENCE_ALGORITHM)
+            # Nur wenige große Dateien: Pfadliste vorab holen, dann einzeln aktualisieren
+            paths = [path for path, info in store.iter_sampled()]
+            todo = deque((path, 1) for path in paths)
+            while todo and self.running:
+                path, attempt = todo.popleft()
+                try:
+                    if self._verify(store, path, algorithm):
+                        self.verified += 1
+                except sqlite3.OperationalError as e:
+                    # Baseline gesperrt (z.B. Vergleich läuft): später erneut
+                    if attempt < MAX_ATTEMPTS:
+                        todo.append((path, attempt + 1))
+                    else:
+                        self.logger.log("WARNING", f"Voll-Verifikation übersprungen: {path} ({e})")
+                time.sleep(self.pause)
+            if self.verified:
+                store.rebuild_digests()
+                self.logger.log("INFO", f"Voll-Verifikation: {self.verified}/{len(paths)} Dateien")
+        finally:
+            store.close()
+            self.running = False
+
+    def _verify(self, store: BaselineStore, path: str, algorithm: str) -> bool:
+        info = store.get(path)
+        try:
+            before = os.stat(path)
+        except OSError:
+            return False
+        if info is None or not stat_unchanged(before, info):
+            return False
+
+        digest = hash_file(path, algorithm)
+        try:
+            after = os.stat(path)
+        except OSError:
+            return False
+        if not digest or not stat_unchanged(after, info):
+            return False
+
+        info.update(hash=digest, sampled=False)
+        store.put(path, info)
+        return True
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Scan-Profile für Baselines: Wurzeln plus kompilierte Include/Exclude-Regeln"""
+
+import fnmatch
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+# Caches, VCS-Metadaten und Pseudo-Dateisysteme: ändern sich ständig oder sind keine Dateien
+COMMON_EXCLUDES = [
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".cache", ".venv", "venv",
+    ".tox", ".mypy_cache", ".pytest_cache", "*.pyc", "*.swp", "*~",
+    "/proc", "/sys", "/dev", "/run",
+]
+
+DEFAULT_PROFILES = {
+    "default": {
+        "roots": ["/etc", "~"],
+        "exclude": COMMON_EXCLUDES + ["~/.cyberguardian"],
+        "one_filesystem": True,
+    },
+    "system": {
+        "roots": ["/etc", "/usr/bin", "/usr/sbin", "/usr/lib/systemd", "/boot"],
+        "exclude": COMMON_EXCLUDES,
+        "one_filesystem": True,
+    },
+    "home": {
+        "roots": ["~"],
+        "exclude": COMMON_EXCLUDES + ["~/.cyberguardian", "~/.local/share/Trash",
+                                      "~/Downloads"],
+        "max_size": 512 * 1024 * 1024,
+        "one_filesystem": True,
+    },
+}
+
+
+class PathMatcher:
+    """Viele Glob/Regex-Muster, kompiliert zu höchstens zwei Regex
+
+    Muster ohne "/" gelten für den Dateinamen, Muster mit "/" für den
+    ganzen Pfad (ein Verzeichnis-Muster trifft auch alles darunter).
+    Präfix "re:" kennzeichnet einen regulären Ausdruck auf dem Pfad.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        name_parts = []
+        path_parts = []
+        for pattern in patterns:
+            if pattern.startswith("re:"):
+                path_parts.append(f"(?:{pattern[3:]})")
+            elif "/" in pattern or pattern.startswith("~"):
+                pattern = os.path.expanduser(pattern).rstrip("/")
+                path_parts.append(f"(?:{_glob_body(pattern)}(?:/.*)?)")
+            else:
+                name_parts.append(f"(?:{_glob_body(pattern)})")
+
+        self.name_re = re.compile(r"\A(?:" + "|".join(name_parts) + r")\Z", re.S) if name_parts else None
+        self.path_re = re.compile(r"\A(?:" + "|".join(path_parts) + r")\Z", re.S) if path_parts else None
+
+    def __bool__(self):
+        return self.name_re is not None or self.path_re is not None
+
+    def match(self, path: str, name: str = None) -> bool:
+        if self.name_re is not None and self.name_re.match(name or os.path.basename(path)):
+            return True
+        return self.path_re is not None and self.path_re.match(path) is not None
+
+
+def _glob_body(pattern: str) -> str:
+    """fnmatch.translate ohne Anker, damit mehrere Muster kombiniert werden können"""
+    translated = fnmatch.translate(pattern)
+    # Format: (?s:BODY)\Z
+    match = re.fullmatch(r"\(\?s:(.*)\)\\[Zz]", translated, re.S)
+    return match.group(1) if match else translated
+
+
+class ScanProfile:
+    """Benanntes Scan-Profil"""
+
+    def __init__(self, name: str, roots: List[str], exclude: List[str] = None,
+                 include: List[str] = None, max_size: int = None, one_filesystem: bool = False):
+        self.name = name
+        self.roots = [os.path.expanduser(r) for r in roots]
+        self.exclude = list(exclude or [])
+        self.include = list(include or [])
+        self.max_size = max_size
+        self.one_filesystem = one_filesystem
+        self.exclude_matcher = PathMatcher(self.exclude)
+        self.include_matcher = PathMatcher(self.include)
+
+    def prune_dir(self, path: str, name: str) -> bool:
+        """Verzeichnis gar nicht erst betreten?"""
+        return bool(self.exclude_matcher) and self.exclude_matcher.match(path, name)
+
+    def accept_file(self, path: str, name: str, stat: os.stat_result = None) -> bool:
+        """Datei in die Baseline aufnehmen?"""
+        if self.exclude_matcher and self.exclude_matcher.match(path, name):
+            return False
+        if self.include_matcher and not self.include_matcher.match(path, name):
+            return False
+        if self.max_size is not None and stat is not None and stat.st_size > self.max_size:
+            return False
+        return True
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "roots": self.roots,
+            "exclude": self.exclude,
+            "include": self.include,
+            "max_size": self.max_size,
+            "one_filesystem": self.one_filesystem,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ScanProfile":
+        return cls(
+            data.get("name", ""),
+            data.get("roots", []),
+            exclude=data.get("exclude"),
+            include=data.get("include"),
+            max_size=data.get("max_size"),
+            one_filesystem=data.get("one_filesystem", False),
+        )
+
+
+def profiles_file() -> Path:
+    return Path.home() / ".cyberguardian" / "scan_profiles.json"
+
+
+def load_profiles() -> Dict[str, Dict]:
+    """Standard-Profile plus eigene aus ~/.cyberguardian/scan_profiles.json"""
+    profiles = {name: dict(data) for name, data in DEFAULT_PROFILES.items()}
+    try:
+        with open(profiles_file(), 'r') as f:
+            profiles.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    return profiles
+
+
+def get_profile(name: str) -> Optional[ScanProfile]:
+    """Profil nach Name (None falls unbekannt)"""
+    data = load_profiles().get(name)
+    if data is None:
+        return None
+    return ScanProfile.from_dict(dict(data, name=name))
@@ -13,7 +13,9 @@ import time
 import socket
 import psutil
 import platform
-from datetime import datetime
+import re
+import itertools
+from datetime import datetime, timedelta
 from pathlib import Path
 import queue
 import netifaces
@@ -60,10 +62,20 @@ FONT_HUD_HEADER = ("Consolas", 20, "bold")
 FONT_HUD_TITLE = ("Consolas", 28, "bold")
 FONT_JP = ("MS Gothic", 10)  # Japanese style font
 
+# Log-Ansicht: Zeitfenster und Seitengroesse
+LOG_WINDOWS = {
+    "Letzte Stunde": timedelta(hours=1),
+    "Heute": timedelta(days=1),
+    "7 Tage": timedelta(days=7),
+    "Alle": None,
+}
+LOG_PAGE_SIZE = 500
+
 try:
     from core.network_scanner import NetworkScanner
     from core.wifi_auditor import WifiAuditor
     from core.port_manager import PortManager
+    from core.nmap_scheduler import NmapScheduler
     from core.process_monitor import ProcessMonitor
     from core.wireguard_manager import WireGuardManager
     from core.anonymizer import Anonymizer
@@ -89,27 +101,51 @@ class CyberGuardianApp(ctk.CTk):
         self.minsize(1200, 800)
 
         self.output_queue = queue.Queue()
+        # Erhöht bei jeder neuen Log-Abfrage; ältere Seiten werden verworfen
+        self.log_generation = 0
 
         if MODULES_AVAILABLE:
             self.config = Config()
-            self.logger = ActionLogger()
-            self.backup_manager = BackupManager()
+            self.logger = ActionLogger(fsync_policy=self.config.get("log_fsync", "interval"))
+            self.backup_manager = BackupManager(
+                codec=self.config.get("backup_codec", "auto"),
+                preset=self.config.get("backup_preset", "balanced"),
+                retention=self.config.get("backup_retention"),
+            )
             self.init_modules()
 
         self.create_ui()
         self.start_background_tasks()
         self.show_legal_notice()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        if MODULES_AVAILABLE:
+            # Wartende Reverse-DNS-Lookups würden das Beenden verzögern
+            self.network_scanner.close()
+            self.logger.close()
+        self.destroy()
 
     def init_modules(self):
-        self.network_scanner = NetworkScanner(self.logger)
+        # Gemeinsamer nmap-Scheduler: ein Cache und ein Limit für alle Scans
+        self.nmap_scheduler = NmapScheduler()
+        self.network_scanner = NetworkScanner(self.logger, rate=self.config.get("scan_rate", 200),
+                                              nmap_scheduler=self.nmap_scheduler)
         self.wifi_auditor = WifiAuditor(self.logger)
-        self.port_manager = PortManager(self.logger, self.backup_manager)
+        self.port_manager = PortManager(self.logger, self.backup_manager,
+                                        nmap_scheduler=self.nmap_scheduler)
         self.process_monitor = ProcessMonitor(self.logger)
         self.wireguard = WireGuardManager(self.logger, self.backup_manager)
         self.anonymizer = Anonymizer(self.logger, self.backup_manager)
         self.router_tools = RouterTools(self.logger)
         self.ids = IntrusionDetection(self.logger)
-        self.file_integrity = FileIntegrityMonitor(self.logger)
+        # Dateien ab dieser Größe zunächst nur stichprobenartig hashen (0 = aus)
+        self.file_integrity = FileIntegrityMonitor(
+            self.logger,
+            sample_threshold=self.config.get("integrity_sample_threshold", 1024**3) or None,
+            sample_blocks=self.config.get("integrity_sample_blocks", 16),
+        )
+        self.file_integrity.resume_verification()
         self.forensics = ForensicsTools(self.logger)
 
     def create_ui(self):
@@ -402,6 +438,10 @@ class CyberGuardianApp(ctk.CTk):
     def panic_stop(self):
         if messagebox.askyesno("PANIC", "Alle Operationen stoppen?"):
             self.status_label.configure(text="PANIC: Gestoppt")
+            if MODULES_AVAILABLE:
+                self.logger.log("ALERT", "PANIC: Alle Operationen gestoppt")
+                # flush wartet auf den Writer-Thread, nicht im Tk-Thread ausführen
+                threading.Thread(target=self.logger.flush, daemon=True).start()
 
     def show_dashboard(self):
         self.clear_main_area()
@@ -528,6 +568,9 @@ class CyberGuardianApp(ctk.CTk):
         ctk.CTkButton(
             frame, text="Netzwerk scannen", command=self.start_network_scan
         ).pack(pady=10)
+        ctk.CTkButton(
+            frame, text="Herstellerliste aktualisieren", command=self.update_vendors
+        ).pack(pady=5)
         self.network_tree = ttk.Treeview(
             frame, columns=("IP", "MAC", "Hostname"), show="headings"
         )
@@ -537,21 +580,37 @@ class CyberGuardianApp(ctk.CTk):
 
     def start_network_scan(self):
         if MODULES_AVAILABLE:
+            for item in self.network_tree.get_children():
+                self.network_tree.delete(item)
             threading.Thread(target=self._scan_network, daemon=True).start()
 
     def _scan_network(self):
-        devices = self.network_scanner.scan_network()
-        self.after(0, lambda: self._update_tree(devices))
+        # Geräte erscheinen live, sobald ihre ARP-Antwort eintrifft
+        for device in self.network_scanner.scan_network_stream():
+            self.after(0, lambda d=device: self._update_tree([d]))
+
+    def update_vendors(self):
+        if MODULES_AVAILABLE:
+            self.output_queue.put("Herstellerliste wird geladen...")
+            threading.Thread(target=self._update_vendors, daemon=True).start()
+
+    def _update_vendors(self):
+        # Download der IEEE-Register, daher nicht im Tk-Thread
+        try:
+            count = self.network_scanner.update_vendors()
+            self.output_queue.put(f"Herstellerliste: {count} Eintraege")
+        except Exception as e:
+            self.logger.log("ERROR", f"Herstellerliste nicht aktualisiert: {e}")
+            self.output_queue.put(f"Herstellerliste fehlgeschlagen: {e}")
 
     def _update_tree(self, devices):
-        for item in self.network_tree.get_children():
-            self.network_tree.delete(item)
         for d in devices:
-            self.network_tree.insert(
-                "",
-                "end",
-                values=(d.get("ip", ""), d.get("mac", ""), d.get("hostname", "")),
-            )
+            values = (d.get("ip", ""), d.get("mac", ""), d.get("hostname", ""))
+            # Eine Zeile pro IP; spätere Meldungen (z.B. Hostname) aktualisieren sie
+            if self.network_tree.exists(values[0]):
+                self.network_tree.item(values[0], values=values)
+            else:
+                self.network_tree.insert("", "end", iid=values[0], values=values)
 
     def show_wifi(self):
         self.clear_main_area()
@@ -684,6 +743,64 @@ class CyberGuardianApp(ctk.CTk):
         ctk.CTkLabel(
             frame, text="Datei-Integritaet", font=ctk.CTkFont(size=24, weight="bold")
         ).pack(pady=10)
+        buttons = ctk.CTkFrame(frame, fg_color="transparent")
+        buttons.pack(pady=10)
+        ctk.CTkButton(
+            buttons, text="Baseline erstellen", command=self.start_baseline
+        ).pack(side="left", padx=5)
+        ctk.CTkButton(
+            buttons, text="Vergleichen", command=self.start_integrity_check
+        ).pack(side="left", padx=5)
+        ctk.CTkButton(
+            buttons, text="Abbrechen", command=self.cancel_integrity
+        ).pack(side="left", padx=5)
+        self.integrity_status = ctk.CTkLabel(frame, text="")
+        self.integrity_status.pack(pady=5)
+        self.integrity_tree = ttk.Treeview(
+            frame, columns=("Typ", "Datei"), show="headings"
+        )
+        for col in ("Typ", "Datei"):
+            self.integrity_tree.heading(col, text=col)
+        self.integrity_tree.pack(fill="both", expand=True, pady=10)
+
+    def start_baseline(self):
+        if MODULES_AVAILABLE:
+            threading.Thread(target=self._create_baseline, daemon=True).start()
+
+    def _create_baseline(self):
+        for _ in self.file_integrity.iter_create_baseline(progress=self._integrity_progress):
+            pass
+        self.after(0, lambda: self.integrity_status.configure(text="Baseline fertig"))
+
+    def start_integrity_check(self):
+        if MODULES_AVAILABLE:
+            for item in self.integrity_tree.get_children():
+                self.integrity_tree.delete(item)
+            threading.Thread(target=self._integrity_check, daemon=True).start()
+
+    def _integrity_check(self):
+        for change in self.file_integrity.iter_compare_baseline(
+            progress=self._integrity_progress
+        ):
+            self.after(0, lambda c=change: self._add_integrity_change(c))
+        self.after(0, lambda: self.integrity_status.configure(text="Vergleich fertig"))
+
+    def _add_integrity_change(self, change):
+        self.integrity_tree.insert(
+            "", "end", values=(change.get("type", ""), change.get("file", ""))
+        )
+
+    def _integrity_progress(self, stats):
+        eta = f", noch ~{stats['eta']:.0f}s" if stats.get("eta") is not None else ""
+        text = (
+            f"{stats['files']} Dateien, {stats['bytes'] / 1024 / 1024:.1f} MiB{eta}"
+            f" - {stats['current_dir']}"
+        )
+        self.after(0, lambda: self.integrity_status.configure(text=text))
+
+    def cancel_integrity(self):
+        if MODULES_AVAILABLE:
+            self.file_integrity.cancel()
 
     def show_forensics(self):
         self.clear_main_area()
@@ -711,8 +828,107 @@ class CyberGuardianApp(ctk.CTk):
         ctk.CTkLabel(frame, text="Logs", font=ctk.CTkFont(size=24, weight="bold")).pack(
             pady=10
         )
+        filters = ctk.CTkFrame(frame, fg_color="transparent")
+        filters.pack(fill="x", padx=10)
+        self.log_window = ctk.CTkOptionMenu(
+            filters, values=list(LOG_WINDOWS), width=140
+        )
+        self.log_window.set("Letzte Stunde")
+        self.log_window.pack(side="left", padx=5)
+        self.log_level = ctk.CTkOptionMenu(
+            filters, values=["Alle", "INFO", "WARNING", "ERROR", "ALERT"], width=110
+        )
+        self.log_level.pack(side="left", padx=5)
+        self.log_search = ctk.CTkEntry(filters, placeholder_text="Suchtext", width=250)
+        self.log_search.pack(side="left", padx=5)
+        ctk.CTkButton(filters, text="Suchen", command=self.start_log_query).pack(
+            side="left", padx=5
+        )
+        ctk.CTkButton(filters, text="Weitere", command=self.next_log_page).pack(
+            side="left", padx=5
+        )
+        self.log_status = ctk.CTkLabel(frame, text="")
+        self.log_status.pack(pady=5)
         self.log_text = ctk.CTkTextbox(frame, height=400)
         self.log_text.pack(fill="both", expand=True, padx=10, pady=10)
+        self.log_results = None
+        self.log_shown = 0
+        self.log_busy = False
+        self.start_log_query()
+
+    def start_log_query(self):
+        if not MODULES_AVAILABLE:
+            return
+        self.log_generation += 1
+        window = LOG_WINDOWS[self.log_window.get()]
+        level = self.log_level.get()
+        text = self.log_search.get().strip()
+        query = dict(
+            start=datetime.now() - window if window else None,
+            levels=None if level == "Alle" else [level],
+            pattern=re.escape(text) if text else None,
+            ignore_case=True,
+        )
+        self.log_results = None
+        self.log_shown = 0
+        self.log_busy = True
+        self.log_text.delete("1.0", "end")
+        self.log_status.configure(text="Suche...")
+        threading.Thread(
+            target=self._run_log_query, args=(self.log_generation, query), daemon=True
+        ).start()
+
+    def _run_log_query(self, generation, query):
+        # flush wartet auf den Writer-Thread, nicht im Tk-Thread ausführen
+        self.logger.flush(timeout=1.0)
+        try:
+            results = self.logger.query_logs(**query)
+        except Exception as e:
+            self.after(0, lambda e=e: self._log_page_failed(generation, e))
+            return
+        self._load_log_page(generation, results)
+
+    def next_log_page(self):
+        if self.log_results is None or self.log_busy:
+            return
+        self.log_busy = True
+        threading.Thread(
+            target=self._load_log_page,
+            args=(self.log_generation, self.log_results),
+            daemon=True,
+        ).start()
+
+    def _load_log_page(self, generation, results):
+        # Generator liest nur so weit, wie die Seite reicht
+        try:
+            page = list(itertools.islice(results, LOG_PAGE_SIZE))
+        except Exception as e:
+            # z.B. unlesbares Segment; sonst bliebe log_busy gesetzt
+            self.after(0, lambda e=e: self._log_page_failed(generation, e))
+            return
+        lines = "".join(
+            f"[{r['timestamp']}] [{r['level']}] {r['message']}\n" for r in page
+        )
+        self.after(
+            0, lambda: self._show_log_page(generation, results, lines, len(page))
+        )
+
+    def _show_log_page(self, generation, results, lines, count):
+        if generation != self.log_generation:
+            # Seite einer inzwischen ersetzten Abfrage
+            return
+        self.log_results = results
+        self.log_text.insert("end", lines)
+        self.log_shown += count
+        more = " (Ende)" if count < LOG_PAGE_SIZE else ""
+        self.log_status.configure(text=f"{self.log_shown} Eintraege{more}")
+        self.log_busy = False
+
+    def _log_page_failed(self, generation, error):
+        if generation != self.log_generation:
+            return
+        self.log_status.configure(text=f"Abfrage fehlgeschlagen: {error}")
+        self.log_busy = False
 
     def show_settings(self):
         self.clear_main_area()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""Append-only Aktions-Journal (JSONL) mit Offset-Index"""
+
+import json
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .log_segments import SegmentStore, first_line_time
+
+
+# Index-Eintrag: Offset, Länge, Zeitstempel, reversibel, Typ (feste Größe)
+INDEX_RECORD = struct.Struct("<QIdB31s")
+
+# Tags im Segment-Manifest, damit Abfragen unpassende Segmente überspringen
+TAG_REVERSIBLE = "reversible"
+
+
+def _type_key(action_type) -> str:
+    """Typ so, wie er im Index steht (auf 31 Bytes gekürzt)"""
+    return str(action_type or "").encode()[:31].decode(errors="ignore")
+
+
+def _line_time(line: bytes) -> Optional[float]:
+    try:
+        return _timestamp(json.loads(line)) or None
+    except ValueError:
+        return None
+
+
+def action_tags(line: bytes) -> List[str]:
+    """Manifest-Tags einer Journal-Zeile: Typ und Reversibilität"""
+    action = _parse(line)
+    if action is None:
+        return []
+    tags = [f"type:{_type_key(action.get('type'))}"]
+    if action.get("reversible"):
+        tags.append(TAG_REVERSIBLE)
+    return tags
+
+
+def _timestamp(action: Dict) -> float:
+    try:
+        return datetime.fromisoformat(action.get("timestamp", "")).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _parse(line: bytes) -> Optional[Dict]:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+class ActionJournal:
+    """Aktionen als eine JSON-Zeile pro Eintrag plus kleinem Binär-Index
+
+    Jeder Eintrag kostet einen Append auf Journal und Index, unabhängig
+    von der Länge der Historie. Beim Öffnen wird eine abgeschnittene
+    letzte Zeile (Absturz während des Schreibens) entfernt und der Index
+    mit dem Journal abgeglichen.
+
+    Mit `segments` wird das aktive Journal ab `rotate_bytes` Größe oder
+    `rotate_age` Sekunden Alter als komprimiertes Segment abgegeben; der
+    Index deckt immer nur das aktive Journal ab.
+
+    Der Index wird zusätzlich im Speicher gehalten (Offsets, Zeiten und
+    Eintragsnummern pro Typ bzw. für reversible Aktionen). Abfragen lesen
+    damit gezielt nur die passenden Zeilen per pread.
+    """
+
+    def __init__(self, journal_file: Path, index_file: Path = None,
+                 segments: SegmentStore = None, rotate_bytes: int = 5 * 1024 * 1024,
+                 rotate_age: float = 7 * 24 * 3600):
+        self.journal_file = Path(journal_file)
+        self.index_file = Path(index_file) if index_file else self.journal_file.with_suffix(".idx")
+        self.lock = threading.Lock()
+        self.journal_file.touch(exist_ok=True)
+        self.index_file.touch(exist_ok=True)
+        self.segments = segments
+        self.rotate_bytes = rotate_bytes
+        self.rotate_age = rotate_age
+        self._recover()
+        self._load_index()
+        self.journal = open(self.journal_file, 'ab')
+        self.index = open(self.index_file, 'ab')
+        self.started = first_line_time(self.journal_file, _line_time)
+
+    def close(self):
+        with self.lock:
+            for f in (self.journal, self.index):
+                if f and not f.closed:
+                    f.close()
+
+    def _recover(self):
+        """Journal auf die letzte vollständige Zeile kürzen, Index angleichen"""
+        size = self.journal_file.stat().st_size
+        end = self._last_line_end(size)
+        if end != size:
+            os.truncate(self.journal_file, end)
+
+        index_size = self.index_file.stat().st_size
+        records = index_size // INDEX_RECORD.size
+        covered = 0
+        with open(self.index_file, 'rb') as f:
+            # Einträge hinter dem Journal-Ende verwerfen (von hinten suchen)
+            while records:
+                f.seek((records - 1) * INDEX_RECORD.size)
+                offset, length = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))[:2]
+                if offset + length <= end:
+                    covered = offset + length
+                    break
+                records -= 1
+        if records * INDEX_RECORD.size != index_size:
+            os.truncate(self.index_file, records * INDEX_RECORD.size)
+
+        if covered < end:
+            # Absturz zwischen Journal- und Index-Write: fehlende Einträge nachtragen
+            with open(self.journal_file, 'rb') as f, open(self.index_file, 'ab') as index:
+                f.seek(covered)
+                offset = covered
+                for line in f:
+                    index.write(INDEX_RECORD.pack(*self._index_fields(offset, line)))
+                    offset += len(line)
+
+    def _last_line_end(self, size: int) -> int:
+        """Position direkt hinter dem letzten Zeilenumbruch"""
+        if size == 0:
+            return 0
+        with open(self.journal_file, 'rb') as f:
+            pos = size
+            while pos > 0:
+                step = min(64 * 1024, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step)
+                nl = chunk.rfind(b"\n")
+                if nl != -1:
+                    return pos + nl + 1
+        return 0
+
+    def _reset_index(self):
+        # Generation: Eintragsnummern gelten nur bis zur nächsten Rotation
+        self.generation = getattr(self, "generation", -1) + 1
+        self.offsets = array('Q')
+        self.lengths = array('I')
+        self.times = array('d')
+        self.by_type_index: Dict[str, array] = {}
+        self.reversible_index = array('I')
+
+    def _load_index(self):
+        """Index-Datei einmal komplett in die Speicher-Indizes laden"""
+        self._reset_index()
+        with open(self.index_file, 'rb') as f:
+            data = f.read()
+        for fields in INDEX_RECORD.iter_unpack(data):
+            self._remember(*fields)
+
+    def _remember(self, offset: int, length: int, ts: float, reversible: int, action_type: bytes):
+        num = len(self.offsets)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.times.append(ts)
+        key = action_type.rstrip(b"\0").decode(errors="ignore")
+        self.by_type_index.setdefault(key, array('I')).append(num)
+        if reversible:
+            self.reversible_index.append(num)
+
+    def _index_fields(self, offset: int, line: bytes, action: Dict = None) -> tuple:
+        if action is None:
+            action = _parse(line) or {}
+        return (offset, len(line), _timestamp(action),
+                1 if action.get("reversible") else 0,
+                _type_key(action.get("type")).encode())
+
+    def append(self, action: Dict):
+        """Aktion anhängen – O(1)"""
+        line = (json.dumps(action, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+        with self.lock:
+            offset = self.journal.tell()
+            self.journal.write(line)
+            self.journal.flush()
+            fields = self._index_fields(offset, line, action)
+            self.index.write(INDEX_RECORD.pack(*fields))
+            self.index.flush()
+            self._remember(*fields)
+            if self.started is None:
+                self.started = time.time()
+            if self.segments is not None and (
+                    offset + len(line) >= self.rotate_bytes
+                    or time.time() - self.started >= self.rotate_age):
+                self._rotate()
+
+    def _rotate(self):
+        """Aktives Journal als Segment abgeben, Index leeren (Lock gehalten)"""
+        self.journal.close()
+        self.index.close()
+        try:
+            self.segments.rotate(self.journal_file)
+            os.truncate(self.index_file, 0)
+        finally:
+            self.journal = open(self.journal_file, 'ab')
+            self.index = open(self.index_file, 'ab')
+            self.started = None
+            self._reset_index()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _read(self, nums: Iterable[int], generation: int) -> List[Dict]:
+        """Einträge des aktiven Journals per Nummer lesen (pread, kein Scan)"""
+        result = []
+        with self.lock:
+            if generation != self.generation:
+                # Zwischenzeitlich rotiert: Nummern zeigen ins neue Journal
+                return result
+            with open(self.journal_file, 'rb', buffering=0) as f:
+                fd = f.fileno()
+                for num in nums:
+                    action = _parse(os.pread(fd, self.lengths[num], self.offsets[num]))
+                    if action is not None:
+                        result.append(action)
+        return result
+
+    def read_all(self) -> List[Dict]:
+        return list(self)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self.iter_range()
+
+    def iter_range(self, start: float = None, end: float = None) -> Iterator[Dict]:
+        """Aktionen im Zeitraum [start, end], älteste zuerst
+
+        Von den Segmenten werden nur die geöffnet, deren Zeitraum laut
+        Manifest überlappt; im aktiven Journal wird der Bereich per
+        Binärsuche auf den (aufsteigenden) Zeitstempeln bestimmt.
+        """
+        if self.segments is not None:
+            yield from self._from_segments(self.segments.segments(start, end),
+                                           lambda a: _in_range(a, start, end))
+        with self.lock:
+            lo = 0 if start is None else bisect_left(self.times, start)
+            hi = len(self.times) if end is None else bisect_right(self.times, end)
+            generation = self.generation
+        # Blockweise lesen, damit der Lock nicht für den ganzen Bereich gehalten wird
+        for block in range(lo, hi, 1000):
+            yield from self._read(range(block, min(block + 1000, hi)), generation)
+
+    def recent(self, count: int) -> List[Dict]:
+        """Die letzten `count` Aktionen (älteste zuerst)
+
+        Liest nur die letzten Index-Einträge; ältere Segmente werden nur
+        geöffnet, solange das aktive Journal nicht genug Einträge hat,
+        und zwar vom neuesten rückwärts.
+        """
+        if count <= 0:
+            return []
+        with self.lock:
+            n = len(self.offsets)
+            generation = self.generation
+        result = self._read(range(max(0, n - count), n), generation)
+        if len(result) >= count or self.segments is None:
+            return result
+
+        older: List[Dict] = []
+        for segment in reversed(self.segments.segments()):
+            missing = count - len(result) - len(older)
+            if missing <= 0:
+                break
+            chunk = deque(self._from_segments([segment]), maxlen=missing)
+            older = list(chunk) + older
+        return older + result
+
+    def by_type(self, action_type: str) -> List[Dict]:
+        """Alle Aktionen eines Typs (älteste zuerst)"""
+        key = _type_key(action_type)
+        found = []
+        if self.segments is not None:
+            found.extend(self._from_segments(self.segments.segments(tag=f"type:{key}"),
+                                             lambda a: a.get("type") == action_type))
+        with self.lock:
+            nums = list(self.by_type_index.get(key, ()))
+            generation = self.generation
+        found.extend(a for a in self._read(nums, generation) if a.get("type") == action_type)
+        return found
+
+    def rollback_actions(self) -> List[Dict]:
+        """Alle reversiblen Aktionen (älteste zuerst)"""
+        found = []
+        if self.segments is not None:
+            found.extend(self._from_segments(self.segments.segments(tag=TAG_REVERSIBLE),
+                                             lambda a: a.get("reversible")))
+        with self.lock:
+            nums = list(self.reversible_index)
+            generation = self.generation
+        found.extend(self._read(nums, generation))
+        return found
+
+    def _from_segments(self, segments: List[Dict], accept=None) -> Iterator[Dict]:
+        for line in self.segments.iter_lines(segments=segments):
+            action = _parse(line)
+            if action is not None and (accept is None or accept(action)):
+                yield action
+
+    def migrate_json(self, json_file: Path) -> Optional[int]:
+        """Übernimm eine alte actions.json (Liste) ins Journal"""
+        if not json_file.exists():
+            return None
+        with open(json_file, 'r') as f:
+            actions = json.load(f)
+        for action in actions:
+            self.append(action)
+        json_file.rename(json_file.with_suffix(".json.migrated"))
+        return len(actions)
+
+
+def _in_range(action: Dict, start: Optional[float], end: Optional[float]) -> bool:
+    ts = _timestamp(action)
+    return (start is None or ts >= start) and (end is None or ts <= end)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""Backup-Katalog (SQLite) mit Aufbewahrungsregeln"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS backups (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    source TEXT NOT NULL,
+    time TEXT NOT NULL,
+    size INTEGER,
+    checksum TEXT,
+    parent TEXT,
+    path TEXT
+);
+CREATE INDEX IF NOT EXISTS backups_group_time ON backups(type, source, time);
+CREATE INDEX IF NOT EXISTS backups_time ON backups(time);
+CREATE TABLE IF NOT EXISTS latest (
+    type TEXT NOT NULL,
+    source TEXT NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (type, source)
+) WITHOUT ROWID;
+"""
+
+FIELDS = ("id", "type", "source", "time", "size", "checksum", "parent", "path")
+
+# Standard-Aufbewahrung pro Gruppe (Typ + Quelle): die letzten N plus je
+# das neueste Backup der letzten Stunden/Tage/Wochen
+DEFAULT_RETENTION = {"keep_last": 5, "hourly": 24, "daily": 7, "weekly": 4}
+
+
+def backup_time(when: datetime = None) -> str:
+    """Einheitliches Zeitformat (sortierbar als Text)"""
+    return (when or datetime.now()).isoformat(timespec="microseconds")
+
+
+def select_keep(times: List[str], policy: Dict) -> Set[int]:
+    """Indizes der zu behaltenden Backups (times absteigend sortiert)"""
+    keep = set(range(min(policy.get("keep_last", 0), len(times))))
+    if times:
+        keep.add(0)
+    buckets = (
+        ("hourly", lambda t: t[:13]),
+        ("daily", lambda t: t[:10]),
+        ("weekly", lambda t: tuple(datetime.fromisoformat(t).isocalendar()[:2])),
+    )
+    for name, bucket_of in buckets:
+        limit = policy.get(name, 0)
+        seen = set()
+        for i, t in enumerate(times):
+            if len(seen) >= limit:
+                break
+            bucket = bucket_of(t)
+            if bucket not in seen:
+                # Neuestes Backup des Zeitraums behalten
+                seen.add(bucket)
+                keep.add(i)
+    return keep
+
+
+class BackupCatalog:
+    """Katalog aller Backups: Typ, Zeit, Größe, Prüfsumme und Vorgänger
+
+    Das jeweils neueste Backup pro Typ/Quelle steht in einer eigenen
+    Tabelle und zusätzlich im Speicher, ist also ohne Suche abrufbar.
+    Listen kommen über den Zeit-Index, ohne Verzeichnis-Scan.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self.latest_cache: Dict[tuple, Dict] = {}
+        for row in self.conn.execute(
+                f"SELECT {', '.join('b.' + f for f in FIELDS)} FROM latest l "
+                "JOIN backups b ON b.id = l.id"):
+            entry = dict(zip(FIELDS, row))
+            self.latest_cache[(entry["type"], entry["source"])] = entry
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def get_meta(self, key: str, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+            self.conn.commit()
+
+    def add(self, backup_type: str, backup_id: str, source: str = None, time: str = None,
+            size: int = None, checksum: str = None, parent: str = None, path: str = None) -> Dict:
+        entry = {"id": backup_id, "type": backup_type, "source": source or backup_type,
+                 "time": time or backup_time(), "size": size, "checksum": checksum,
+                 "parent": parent, "path": path}
+        key = (entry["type"], entry["source"])
+        with self.lock:
+            self.conn.execute(f"INSERT OR REPLACE INTO backups VALUES ({', '.join('?' * len(FIELDS))})",
+                              [entry[f] for f in FIELDS])
+            current = self.latest_cache.get(key)
+            if current is None or entry["time"] >= current["time"]:
+                self.conn.execute("INSERT OR REPLACE INTO latest VALUES (?, ?, ?)",
+                                  (entry["type"], entry["source"], entry["id"]))
+                self.latest_cache[key] = entry
+            self.conn.commit()
+        return entry
+
+    def get(self, backup_id: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute(f"SELECT {', '.join(FIELDS)} FROM backups WHERE id=?",
+                                    (backup_id,)).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def latest(self, backup_type: str, source: str = None) -> Optional[Dict]:
+        """Neuestes Backup eines Typs (O(1), aus dem Speicher)"""
+        if source is not None:
+            return self.latest_cache.get((backup_type, source))
+        candidates = [e for (t, _), e in self.latest_cache.items() if t == backup_type]
+        return max(candidates, key=lambda e: e["time"]) if candidates else None
+
+    def list(self, limit: int = None, backup_type: str = None) -> List[Dict]:
+        """Backups, neueste zuerst (über den Zeit-Index)"""
+        sql = f"SELECT {', '.join(FIELDS)} FROM backups"
+        params: list = []
+        if backup_type is not None:
+            sql += " WHERE type=?"
+            params.append(backup_type)
+        sql += " ORDER BY time DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            return [dict(zip(FIELDS, row)) for row in self.conn.execute(sql, params)]
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM backups").fetchone()[0]
+
+    def groups(self) -> List[tuple]:
+        return list(self.latest_cache)
+
+    def group(self, backup_type: str, source: str) -> List[Dict]:
+        """Alle Backups einer Gruppe, neueste zuerst"""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(FIELDS)} FROM backups WHERE type=? AND source=? "
+                "ORDER BY time DESC", (backup_type, source)).fetchall()
+        return [dict(zip(FIELDS, row)) for row in rows]
+
+    def remove(self, backup_ids: List[str]):
+        with self.lock:
+            self.conn.executemany("DELETE FROM backups WHERE id=?", [(i,) for i in backup_ids])
+            self.conn.commit()
+
+    def expired(self, backup_type: str, source: str, policy: Dict) -> List[Dict]:
+        """Backups einer Gruppe, die laut Regel entfallen (ältestes zuerst)"""
+        entries = self.group(backup_type, source)
+        keep = select_keep([e["time"] for e in entries], policy)
+        return [e for i, e in reversed(list(enumerate(entries))) if i not in keep]
@@ -5,36 +5,105 @@ import subprocess
 import shutil
 import os
 import json
+import hashlib
+import threading
 from pathlib import Path
 from datetime import datetime
-import tarfile
+from typing import Dict
+
+from .backup_catalog import DEFAULT_RETENTION, BackupCatalog, backup_time
+from .chunk_store import ChunkStore
+from .firewall_snapshots import FirewallSnapshots
+
+
+def _sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
 
 
 class BackupManager:
     """Backup-Verwaltung für System-Wiederherstellung"""
     
-    def __init__(self):
+    def __init__(self, codec: str = "auto", preset: str = "balanced", workers: int = None,
+                 retention: Dict = None):
         self.backup_dir = Path.home() / ".cyberguardian" / "backups"
         self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self.repo = ChunkStore(self.backup_dir / "repo", codec=codec, preset=preset,
+                               workers=workers)
+        self.firewall = FirewallSnapshots(self.backup_dir / "firewall")
+        self.catalog = BackupCatalog(self.backup_dir / "catalog.db")
+        self.retention = dict(DEFAULT_RETENTION, **(retention or {}))
+        self.prune_thread = None
+        # Schützt Repository und Snapshots vor gleichzeitigem Schreiben und Aufräumen
+        self.lock = threading.RLock()
+        self._migrate_firewall_backups()
+        if not self.catalog.get_meta("imported"):
+            self._import_existing()
+
+    def _import_existing(self):
+        """Einmalig: vorhandene Backups in den Katalog aufnehmen"""
+        parent = None
+        for entry in self.firewall.index:
+            self.catalog.add("firewall", entry["id"], time=entry["time"], checksum=entry["hash"],
+                             parent=parent, path=str(self.firewall.directory / entry["id"]))
+            parent = entry["id"]
+        for name in self.repo.list_manifests():
+            path = self.repo.manifests / f"{name}.json"
+            try:
+                manifest = self.repo.load_manifest(name)
+            except (OSError, ValueError):
+                continue
+            self.catalog.add("full", name, time=backup_time(datetime.fromisoformat(manifest["created"])),
+                             size=manifest.get("bytes"), checksum=_sha256(path),
+                             parent=manifest.get("parent"), path=str(path))
+        for path in sorted(self.backup_dir.iterdir()):
+            if not path.is_file() or path.name == self.catalog.db_path.name \
+                    or path.name.startswith(self.catalog.db_path.name):
+                continue
+            st = path.stat()
+            backup_type = "full_tar" if path.name.startswith("full_backup_") else "file"
+            # Einzeldatei-Backups heißen <name>_<YYYYmmdd>_<HHMMSS>
+            source = path.name.rsplit("_", 2)[0] if backup_type == "file" else None
+            self.catalog.add(backup_type, path.name, source=source,
+                             time=backup_time(datetime.fromtimestamp(st.st_mtime)),
+                             size=st.st_size, checksum=_sha256(path), path=str(path))
+        self.catalog.set_meta("imported", backup_time())
+
+    def _migrate_firewall_backups(self):
+        """Alte firewall_*.txt einmalig in die Snapshot-Historie übernehmen"""
+        for legacy in sorted(self.backup_dir.glob("firewall_*.txt")):
+            try:
+                when = datetime.strptime(legacy.stem, "firewall_%Y%m%d_%H%M%S")
+                with open(legacy, 'r') as f:
+                    self.firewall.add(f.read(), when)
+                legacy.unlink()
+            except (OSError, ValueError):
+                continue
         
     def backup_firewall(self) -> str:
-        """Backup Firewall-Regeln"""
+        """Backup Firewall-Regeln (neuer Snapshot nur, wenn sich etwas geändert hat)"""
         try:
-            if shutil.which("ufw"):
-                subprocess.run(["sudo", "ufw", "status", "numbered"], capture_output=True)
-                
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = self.backup_dir / f"firewall_{timestamp}.txt"
-            
-            if shutil.which("iptables"):
-                result = subprocess.run(
-                    ["sudo", "iptables-save"],
-                    capture_output=True, text=True
-                )
-                with open(backup_path, 'w') as f:
-                    f.write(result.stdout)
-                    
-            return str(backup_path)
+            if not shutil.which("iptables"):
+                return ""
+            result = subprocess.run(
+                ["sudo", "iptables-save"],
+                capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                return ""
+            with self.lock:
+                latest = self.firewall.latest()
+                entry = self.firewall.add(result.stdout)
+            path = self.firewall.directory / entry["id"]
+            if entry is not latest:
+                self.catalog.add("firewall", entry["id"], time=entry["time"],
+                                 checksum=entry["hash"], parent=latest["id"] if latest else None,
+                                 path=str(path))
+                self.prune_async()
+            return str(path)
             
         except Exception as e:
             return ""
@@ -47,39 +116,100 @@ class BackupManager:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 backup_path = self.backup_dir / f"{path.name}_{timestamp}"
                 shutil.copy2(filepath, backup_path)
+                source = str(path.resolve())
+                previous = self.catalog.latest("file", source)
+                self.catalog.add("file", backup_path.name, source=source,
+                                 size=backup_path.stat().st_size, checksum=_sha256(backup_path),
+                                 parent=previous["id"] if previous else None,
+                                 path=str(backup_path))
+                self.prune_async()
                 return str(backup_path)
         except:
             pass
         return ""
         
     def create_full_backup(self) -> str:
-        """Erstelle vollständiges System-Backup"""
+        """Erstelle vollständiges System-Backup (dedupliziert, nur Änderungen kosten Platz)"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = self.backup_dir / f"full_backup_{timestamp}.tar.gz"
-            
-            with tarfile.open(backup_file, "w:gz") as tar:
-                home = Path.home()
-                tar.add(home / ".cyberguardian", arcname=".cyberguardian")
-                
-            return str(backup_file)
+            # Backups selbst nicht mitsichern
+            previous = self.catalog.latest("full")
+            with self.lock:
+                manifest = self.repo.backup(Path.home() / ".cyberguardian",
+                                            exclude={self.backup_dir},
+                                            parent=previous["id"] if previous else None)
+            path = self.repo.manifests / f"{manifest['name']}.json"
+            self.catalog.add("full", manifest["name"], size=manifest["bytes"],
+                             checksum=_sha256(path), parent=manifest.get("parent"),
+                             path=str(path))
+            self.prune_async()
+            return str(path)
             
         except Exception as e:
             return ""
+
+    def restore_full_backup(self, name: str, target: str = None) -> bool:
+        """Stelle ein Voll-Backup wieder her (Standard: ~/.cyberguardian)"""
+        try:
+            self.repo.restore(name, Path(target) if target else Path.home() / ".cyberguardian")
+            return True
+        except Exception:
+            return False
             
-    def restore_all(self) -> bool:
-        """Stelle alle Backups wieder her"""
+    def restore_all(self, when: datetime = None) -> bool:
+        """Stelle Firewall-Regeln wieder her (Stand zum Zeitpunkt `when`, sonst neuester)"""
         try:
-            backups = sorted(self.backup_dir.glob("firewall_*.txt"))
-            if backups:
-                latest = backups[-1]
-                if shutil.which("iptables"):
-                    with open(latest, 'r') as f:
-                        subprocess.run(["sudo", "iptables-restore"], input=f.read())
+            entry = self.firewall.at(when)
+            if entry and shutil.which("iptables"):
+                subprocess.run(["sudo", "iptables-restore"], input=self.firewall.load(entry),
+                               text=True)
             return True
         except:
             return False
             
-    def list_backups(self) -> list:
-        """Liste verfügbare Backups"""
-        return [b.name for b in sorted(self.backup_dir.glob("*")) if b.is_file()]
+    def list_backups(self, limit: int = None, backup_type: str = None) -> list:
+        """Liste verfügbare Backups, neueste zuerst (aus dem Katalog, ohne Verzeichnis-Scan)"""
+        return [e["id"] for e in self.catalog.list(limit, backup_type)]
+
+    def latest_backup(self, backup_type: str) -> Dict:
+        """Neuestes Backup eines Typs (firewall, full, file)"""
+        return self.catalog.latest(backup_type)
+
+    def prune_async(self):
+        """Aufbewahrungsregeln im Hintergrund anwenden"""
+        if self.prune_thread and self.prune_thread.is_alive():
+            return
+        self.prune_thread = threading.Thread(target=self.prune, daemon=True)
+        self.prune_thread.start()
+
+    def prune(self) -> int:
+        """Abgelaufene Backups aller Gruppen löschen, Anzahl"""
+        with self.lock:
+            return self._prune()
+
+    def _prune(self) -> int:
+        removed = []
+        gc_needed = False
+        for backup_type, source in self.catalog.groups():
+            expired = self.catalog.expired(backup_type, source, self.retention)
+            if not expired:
+                continue
+            if backup_type == "firewall":
+                # Nur ältere als das älteste behaltene (Delta-Kette)
+                kept = {e["id"] for e in self.catalog.group(backup_type, source)} - {e["id"] for e in expired}
+                oldest_kept = min(self.catalog.get(i)["time"] for i in kept)
+                expired = [e for e in expired if e["time"] < oldest_kept]
+                self.firewall.drop_before(oldest_kept)
+            for entry in expired:
+                if backup_type == "full":
+                    self.repo.delete_manifest(entry["id"])
+                    gc_needed = True
+                elif backup_type != "firewall" and entry["path"]:
+                    try:
+                        os.unlink(entry["path"])
+                    except FileNotFoundError:
+                        pass
+                removed.append(entry["id"])
+        self.catalog.remove(removed)
+        if gc_needed:
+            self.repo.gc()
+        return len(removed)
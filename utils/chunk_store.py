@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Inhaltsadressierter Chunk-Speicher mit Deduplizierung für Voll-Backups"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+from .compression import compress, decompress, resolve_codec
+
+
+# Content-Defined Chunking: Grenzen hängen vom Inhalt ab, nicht vom Offset,
+# so dass eingefügte Bytes nur die betroffenen Chunks verändern
+MIN_CHUNK = 256 * 1024
+AVG_BITS = 20                 # ~1 MiB Durchschnitt
+MAX_CHUNK = 4 * 1024 * 1024
+READ_SIZE = 8 * 1024 * 1024
+
+# Jedes Byte wird über eine feste Zufallstabelle auf 0 oder 1 abgebildet;
+# geschnitten wird hinter AVG_BITS aufeinanderfolgenden 1-Bytes (Chance
+# 2^-AVG_BITS je Position). Die Tabelle muss über alle Läufe gleich bleiben,
+# sonst keine Deduplizierung.
+_rng = random.Random(0x43474352)
+_BITS = bytes(_rng.getrandbits(1) for _ in range(256))
+_RUN = b"\x01" * AVG_BITS
+
+
+def find_cut(buf, min_size: int = MIN_CHUNK, max_size: int = MAX_CHUNK) -> int:
+    """Länge des ersten Chunks in `buf`
+
+    `buf` muss mindestens `max_size` Bytes enthalten oder das Dateiende
+    sein. Die Grenze hängt nur von den AVG_BITS Bytes davor ab. Gesucht
+    wird mit bytes.translate und bytes.find, also in C statt Byte für
+    Byte in Python.
+    """
+    n = len(buf)
+    if n <= min_size:
+        return n
+    limit = min(n, max_size)
+    # Fenster beginnt so, dass der früheste Schnitt hinter min_size liegt
+    start = max(min_size - AVG_BITS + 1, 0)
+    pos = bytes(buf[start:limit]).translate(_BITS).find(_RUN)
+    if pos < 0:
+        return limit
+    return start + pos + AVG_BITS
+
+
+def iter_chunks(f) -> Iterator[bytes]:
+    """Zerlege einen Datenstrom in inhaltsdefinierte Chunks"""
+    buf = bytearray()
+    eof = False
+    while True:
+        while not eof and len(buf) < MAX_CHUNK:
+            data = f.read(READ_SIZE)
+            if not data:
+                eof = True
+                break
+            buf += data
+        if not buf:
+            return
+        cut = find_cut(buf) if len(buf) >= MAX_CHUNK or eof else len(buf)
+        yield bytes(buf[:cut])
+        del buf[:cut]
+
+
+class ChunkStore:
+    """Backup-Repository: Chunks nach SHA-256 abgelegt, Backups als Manifeste
+
+    Jeder eindeutige Chunk wird genau einmal (komprimiert) unter
+    objects/<xx>/<sha256> gespeichert. Ein Backup ist nur ein Manifest
+    mit Dateiliste und Chunk-Referenzen. Dateien, deren Größe, mtime und
+    Inode seit dem letzten Backup gleich sind, werden nicht neu gelesen.
+
+    Die Chunk-Grenzen werden seriell im aufrufenden Thread gesucht (hält
+    den GIL, gemessen ~150-250 MiB/s je Kern). Nur Hashen und Komprimieren
+    der Chunks (bzw. Dekomprimieren beim Restore) laufen im Thread-Pool;
+    hashlib und die Codecs geben dabei den GIL frei. Schneller als die
+    Grenzsuche wird ein Backup also auch mit vielen Workern nicht; bei
+    zlib (~55 MiB/s je Kern) ist sie nicht der Engpass. Höchstens
+    `2 * workers` Chunks sind gleichzeitig unterwegs.
+    """
+
+    def __init__(self, root: Path, codec: str = None, preset: str = "balanced",
+                 workers: int = None):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.manifests = self.root / "manifests"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.manifests.mkdir(parents=True, exist_ok=True)
+        self.codec = resolve_codec(codec)
+        self.preset = preset
+        self.workers = workers or os.cpu_count() or 1
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest
+
+    def has_chunk(self, digest: str) -> bool:
+        return self._object_path(digest).exists()
+
+    def put_chunk(self, data: bytes) -> tuple:
+        """Chunk speichern, falls neu: (digest, neu gespeicherte Bytes)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if path.exists():
+            return digest, 0
+        path.parent.mkdir(exist_ok=True)
+        packed = compress(data, self.codec, self.preset)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, 'wb') as f:
+            f.write(packed)
+        os.replace(tmp, path)
+        return digest, len(packed)
+
+    def get_chunk(self, digest: str) -> bytes:
+        with open(self._object_path(digest), 'rb') as f:
+            data = decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Chunk beschädigt: {digest}")
+        return data
+
+    def list_manifests(self) -> List[str]:
+        return sorted(p.stem for p in self.manifests.glob("*.json"))
+
+    def load_manifest(self, name: str) -> Dict:
+        with open(self.manifests / f"{name}.json", 'r') as f:
+            return json.load(f)
+
+    def latest_manifest(self) -> Optional[Dict]:
+        names = self.list_manifests()
+        return self.load_manifest(names[-1]) if names else None
+
+    def _new_name(self) -> str:
+        """Eindeutiger, chronologisch sortierbarer Manifest-Name (Mikrosekunden, ggf. Zähler)"""
+        base = f"full_backup_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        name, seq = base, 1
+        while (self.manifests / f"{name}.json").exists():
+            name = f"{base}_{seq}"
+            seq += 1
+        return name
+
+    def backup(self, source: Path, name: str = None, exclude: Set[Path] = None,
+               parent: str = None) -> Dict:
+        """Verzeichnisbaum sichern, nur geänderte Bytes werden neu gespeichert
+
+        `parent` ist das Vorgänger-Manifest für den Stat-Abgleich
+        (Standard: das neueste vorhandene).
+        """
+        source = Path(source)
+        exclude = {Path(p) for p in (exclude or ())}
+        name = name or self._new_name()
+
+        previous = {}
+        try:
+            latest = self.load_manifest(parent) if parent else self.latest_manifest()
+        except (OSError, ValueError):
+            latest = None
+        if latest and latest.get("source") == str(source):
+            previous = {e["path"]: e for e in latest["files"]}
+
+        files = []
+        total = stored = 0
+        pending = deque()
+        limit = 2 * self.workers
+
+        def settle(keep: int):
+            nonlocal stored
+            while len(pending) > keep:
+                chunks, index, future = pending.popleft()
+                chunks[index], new = future.result()
+                stored += new
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            def submit(chunks: List, data: bytes):
+                # Platzhalter, der Digest wird beim Abholen eingetragen
+                chunks.append(None)
+                pending.append((chunks, len(chunks) - 1, pool.submit(self.put_chunk, data)))
+                settle(limit)
+
+            for path in self._walk(source, exclude):
+                entry = self._backup_file(source, path, previous, submit)
+                if entry is not None:
+                    total += entry["size"]
+                    files.append(entry)
+            settle(0)
+
+        manifest = {
+            "name": name,
+            "created": datetime.now().isoformat(),
+            "source": str(source),
+            "parent": latest.get("name") if latest else None,
+            "files": files,
+            "bytes": total,
+            "stored_bytes": stored,
+        }
+        tmp = self.manifests / f"{name}.json.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.manifests / f"{name}.json")
+        return manifest
+
+    def _backup_file(self, source: Path, path: Path, previous: Dict, submit) -> Optional[Dict]:
+        rel = str(path.relative_to(source))
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        entry = {"path": rel, "mode": st.st_mode & 0o7777, "size": st.st_size,
+                 "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+        old = previous.get(rel)
+        if (old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns
+                and old["inode"] == st.st_ino
+                and all(self.has_chunk(c) for c in old["chunks"])):
+            entry["chunks"] = old["chunks"]
+            return entry
+
+        chunks = []
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter_chunks(f):
+                    submit(chunks, chunk)
+        except OSError:
+            # Bereits gespeicherte Chunks räumt gc() ab
+            return None
+        entry["chunks"] = chunks
+        return entry
+
+    def _walk(self, source: Path, exclude: Set[Path]) -> Iterator[Path]:
+        for root, dirs, names in os.walk(source):
+            root_path = Path(root)
+            dirs[:] = sorted(d for d in dirs if root_path / d not in exclude)
+            for n in sorted(names):
+                path = root_path / n
+                if path not in exclude and path.is_file() and not path.is_symlink():
+                    yield path
+
+    def restore(self, name: str, target: Path) -> int:
+        """Backup nach `target` zurückschreiben, Anzahl Dateien"""
+        manifest = self.load_manifest(name)
+        target = Path(target)
+        count = 0
+        limit = 2 * self.workers
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for entry in manifest["files"]:
+                path = target / entry["path"]
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(path.name + ".restore.tmp")
+                with open(tmp, 'wb') as f:
+                    # Vorauslesen im Pool, Schreiben in Reihenfolge
+                    window = deque()
+                    for digest in entry["chunks"]:
+                        window.append(pool.submit(self.get_chunk, digest))
+                        if len(window) >= limit:
+                            f.write(window.popleft().result())
+                    while window:
+                        f.write(window.popleft().result())
+                os.chmod(tmp, entry["mode"])
+                os.replace(tmp, path)
+                os.utime(path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+                count += 1
+        return count
+
+    def delete_manifest(self, name: str):
+        try:
+            os.unlink(self.manifests / f"{name}.json")
+        except FileNotFoundError:
+            pass
+
+    def gc(self) -> int:
+        """Nicht mehr referenzierte Chunks löschen (Mark & Sweep), freigegebene Bytes"""
+        referenced = set()
+        for name in self.list_manifests():
+            for entry in self.load_manifest(name)["files"]:
+                referenced.update(entry["chunks"])
+        freed = 0
+        for path in self.objects.glob("*/*"):
+            if path.suffix != ".tmp" and path.name not in referenced:
+                freed += path.stat().st_size
+                path.unlink()
+        return freed
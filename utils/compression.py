@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Wählbare Kompressions-Codecs für Backup-Chunks"""
+
+import zlib
+from typing import Dict, List
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4frame
+except ImportError:
+    lz4frame = None
+
+
+# Gespeicherte Chunks: MAGIC + Codec-Byte + Daten. Chunks ohne MAGIC sind
+# ältere, reine zlib-Daten.
+MAGIC = b"CGC"
+
+CODEC_IDS = {"zlib": 1, "zstd": 2, "lz4": 3}
+CODEC_NAMES = {v: k for k, v in CODEC_IDS.items()}
+
+# Stufen je Preset: schnell, ausgewogen, maximal
+PRESETS: Dict[str, Dict[str, int]] = {
+    "fast": {"zstd": 1, "lz4": 0, "zlib": 1},
+    "balanced": {"zstd": 3, "lz4": 4, "zlib": 6},
+    "max": {"zstd": 19, "lz4": 12, "zlib": 9},
+}
+
+
+def available_codecs() -> List[str]:
+    """Installierte Codecs, schnellster zuerst"""
+    codecs = []
+    if zstandard is not None:
+        codecs.append("zstd")
+    if lz4frame is not None:
+        codecs.append("lz4")
+    codecs.append("zlib")
+    return codecs
+
+
+def resolve_codec(codec: str = None) -> str:
+    """"auto"/None → bester verfügbarer Codec; fehlende fallen auf zlib zurück"""
+    if not codec or codec == "auto":
+        return available_codecs()[0]
+    if codec not in CODEC_IDS:
+        raise ValueError(f"Unbekannter Codec: {codec} (verfügbar: {', '.join(available_codecs())})")
+    return codec if codec in available_codecs() else "zlib"
+
+
+def compress(data: bytes, codec: str, preset: str = "balanced") -> bytes:
+    """Komprimieren inkl. Kopf (gibt den GIL bei allen Codecs frei)"""
+    level = PRESETS.get(preset, PRESETS["balanced"])[codec]
+    if codec == "zstd":
+        body = zstandard.ZstdCompressor(level=level).compress(data)
+    elif codec == "lz4":
+        body = lz4frame.compress(data, compression_level=level)
+    else:
+        body = zlib.compress(data, level)
+    return MAGIC + bytes([CODEC_IDS[codec]]) + body
+
+
+def decompress(packed: bytes) -> bytes:
+    if not packed.startswith(MAGIC):
+        return zlib.decompress(packed)
+    codec = CODEC_NAMES.get(packed[len(MAGIC)])
+    body = packed[len(MAGIC) + 1:]
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("Chunk mit zstd komprimiert, Modul 'zstandard' fehlt")
+        return zstandard.ZstdDecompressor().decompress(body)
+    if codec == "lz4":
+        if lz4frame is None:
+            raise ValueError("Chunk mit lz4 komprimiert, Modul 'lz4' fehlt")
+        return lz4frame.decompress(body)
+    if codec == "zlib":
+        return zlib.decompress(body)
+    raise ValueError(f"Unbekannter Codec im Chunk: {packed[len(MAGIC)]}")
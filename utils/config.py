@@ -2,33 +2,133 @@
 """Konfigurations-Modul"""
 
 import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Any, Dict
 
+try:
+    import fcntl
+except ImportError:
+    # Windows: msvcrt statt flock
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Exklusive Sperre über eine Lock-Datei (ohne Sperrmechanismus: keine)"""
+    with open(path, 'w') as lock:
+        if fcntl is not None:
+            # Freigabe beim Schließen der Datei
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+        elif msvcrt is not None:
+            # LK_LOCK versucht es 10 Sekunden lang und wirft dann OSError
+            while True:
+                try:
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            yield
+
 
 class Config:
-    """Konfigurations-Verwaltung"""
-    
-    def __init__(self):
+    """Konfigurations-Verwaltung
+
+    Gelesen wird aus dem Speicher; die Datei wird nur neu geladen, wenn
+    sich mtime/Größe/Inode geändert haben (geprüft höchstens alle
+    `check_interval` Sekunden). Schreiben ersetzt die Datei atomar
+    (temporäre Datei + rename) und überträgt nur die eigenen Änderungen
+    auf den aktuellen Stand der Datei, so dass mehrere laufende Instanzen
+    sich nicht gegenseitig überschreiben.
+    """
+
+    def __init__(self, check_interval: float = 1.0):
         self.config_dir = Path.home() / ".cyberguardian"
         self.config_file = self.config_dir / "config.json"
+        self.lock_file = self.config_dir / "config.json.lock"
+        self.check_interval = check_interval
+        self.lock = threading.RLock()
+        self.signature = None
+        self.last_check = 0.0
+        self.pending: Dict[str, Any] = {}
+        self.batch_depth = 0
         self._load()
-        
+
     def _load(self):
         """Lade Konfiguration"""
         if self.config_file.exists():
-            with open(self.config_file, 'r') as f:
-                self.data = json.load(f)
+            self._reload()
         else:
             self.data = self._default_config()
+            self.pending = dict(self.data)
             self._save()
-            
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.config_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _reload(self):
+        """Datei lesen, eigene noch nicht gespeicherte Änderungen obenauf"""
+        signature = self._stat_signature()
+        try:
+            with open(self.config_file, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            data = getattr(self, "data", None) or self._default_config()
+        data.update(self.pending)
+        self.data = data
+        self.signature = signature
+
+    def _refresh(self):
+        """Neu laden, falls eine andere Instanz die Datei geändert hat"""
+        now = time.monotonic()
+        if now - self.last_check < self.check_interval:
+            return
+        self.last_check = now
+        if self._stat_signature() != self.signature:
+            self._reload()
+
     def _save(self):
-        """Speichere Konfiguration"""
+        """Speichere Konfiguration (atomar, eigene Änderungen auf aktuellen Stand)"""
         self.config_dir.mkdir(parents=True, exist_ok=True)
-        with open(self.config_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
-            
+        # Lesen-Ändern-Schreiben gegen andere Prozesse absichern
+        with _file_lock(self.lock_file):
+            if self._stat_signature() != self.signature:
+                self._reload()
+            fd, tmp = tempfile.mkstemp(dir=self.config_dir, prefix=".config.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.config_file)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except FileNotFoundError:
+                    pass
+                raise
+            self.pending.clear()
+            self.signature = self._stat_signature()
+
     def _default_config(self) -> Dict:
         """Standard-Konfiguration"""
         return {
@@ -38,19 +138,50 @@ class Config:
             "notify_sound": True,
             "notify_desktop": True,
             "log_level": "INFO",
+            "log_fsync": "interval",
+            "backup_codec": "auto",
+            "backup_preset": "balanced",
+            "backup_retention": {"keep_last": 5, "hourly": 24, "daily": 7, "weekly": 4},
+            "scan_rate": 200,
+            "integrity_sample_threshold": 1024 * 1024 * 1024,
+            "integrity_sample_blocks": 16,
             "default_scan_range": "192.168.1.0/24"
         }
-        
+
     def get(self, key: str, default=None) -> Any:
         """Hole Wert"""
-        return self.data.get(key, default)
-        
+        with self.lock:
+            self._refresh()
+            return self.data.get(key, default)
+
+    @contextmanager
+    def batch(self):
+        """Mehrere Änderungen als eine atomare Schreiboperation
+
+        Bei einer Exception im Block werden die Änderungen verworfen.
+        Verschachtelte Batches schreiben erst beim äußersten Ende.
+        """
+        with self.lock:
+            if self.batch_depth == 0:
+                snapshot = (dict(self.data), dict(self.pending))
+            self.batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self.batch_depth -= 1
+                if self.batch_depth == 0:
+                    self.data, self.pending = snapshot
+                raise
+            self.batch_depth -= 1
+            if self.batch_depth == 0 and self.pending:
+                self._save()
+
     def set(self, key: str, value: Any):
         """Setze Wert"""
-        self.data[key] = value
-        self._save()
-        
+        self.update({key: value})
+
     def update(self, updates: Dict):
         """Update mehrere Werte"""
-        self.data.update(updates)
-        self._save()
+        with self.batch():
+            self.data.update(updates)
+            self.pending.update(updates)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Firewall-Snapshots: nur bei Änderung gespeichert, ältere Stände als Delta"""
+
+import bisect
+import difflib
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+# Alle KEYFRAME_INTERVAL Snapshots bleibt einer vollständig erhalten,
+# damit eine Wiederherstellung höchstens so viele Deltas anwenden muss
+KEYFRAME_INTERVAL = 16
+
+_COUNTERS = re.compile(r"\[\d+:\d+\]")
+
+
+def normalize_ruleset(text: str) -> str:
+    """iptables-save-Ausgabe ohne Zeitstempel-Kommentare und Paketzähler"""
+    lines = []
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        lines.append(_COUNTERS.sub("[0:0]", line))
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def make_delta(base: List[str], target: List[str]) -> List:
+    """Zeilen-Delta: Bereiche aus `base` kopieren oder neue Zeilen einfügen"""
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, base, target, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(target[j1:j2])
+    return ops
+
+
+def apply_delta(base: List[str], ops: List) -> List[str]:
+    result = []
+    for op in ops:
+        if len(op) == 2 and all(isinstance(x, int) for x in op):
+            result.extend(base[op[0]:op[1]])
+        else:
+            result.extend(op)
+    return result
+
+
+class FirewallSnapshots:
+    """Versionierte Firewall-Regelsätze
+
+    Der neueste Snapshot liegt vollständig vor, ältere als Delta gegen
+    ihren Nachfolger (Rückwärts-Deltas); jeder KEYFRAME_INTERVAL-te
+    bleibt vollständig. Der Index (index.json) ist nach Zeit sortiert,
+    ein Zeitpunkt wird per Binärsuche gefunden.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.directory / "index.json"
+        self.index: List[Dict] = self._load_index()
+
+    def _load_index(self) -> List[Dict]:
+        try:
+            with open(self.index_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def _save_index(self):
+        tmp = self.index_file.with_suffix(".tmp")
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp, self.index_file)
+
+    def _path(self, entry: Dict) -> Path:
+        suffix = ".rules" if entry["kind"] == "full" else ".delta"
+        return self.directory / f"{entry['id']}{suffix}"
+
+    def _write(self, path: Path, data: str):
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def latest(self) -> Optional[Dict]:
+        return self.index[-1] if self.index else None
+
+    def add(self, ruleset: str, when: datetime = None) -> Dict:
+        """Snapshot speichern, falls sich der Regelsatz geändert hat"""
+        ruleset = normalize_ruleset(ruleset)
+        digest = hashlib.sha256(ruleset.encode()).hexdigest()
+        latest = self.latest()
+        if latest is not None and latest["hash"] == digest:
+            return latest
+
+        when = when or datetime.now()
+        seq = latest["seq"] + 1 if latest else 0
+        entry = {"id": f"{when.strftime('%Y%m%d_%H%M%S')}_{seq}", "seq": seq,
+                 "time": when.isoformat(timespec="microseconds"), "hash": digest, "kind": "full"}
+        self._write(self._path(entry), ruleset)
+
+        if latest is not None and latest["seq"] % KEYFRAME_INTERVAL:
+            # Bisher neuesten Stand in ein Delta gegen den neuen umwandeln
+            previous = self.load(latest)
+            delta = make_delta(ruleset.splitlines(keepends=True),
+                               previous.splitlines(keepends=True))
+            old_path = self._path(latest)
+            latest.update(kind="delta", base=entry["id"])
+            self._write(self._path(latest), json.dumps(delta))
+            self.index.append(entry)
+            self._save_index()
+            old_path.unlink()
+        else:
+            self.index.append(entry)
+            self._save_index()
+        return entry
+
+    def load(self, entry: Dict) -> str:
+        """Regelsatz eines Snapshots rekonstruieren (höchstens KEYFRAME_INTERVAL Deltas)"""
+        # Deltas zeigen immer auf den direkten Nachfolger im Index
+        pos = bisect.bisect_left(self.index, entry["seq"], key=lambda e: e["seq"])
+        chain = []
+        while entry["kind"] == "delta":
+            chain.append(entry)
+            pos += 1
+            entry = self.index[pos]
+        with open(self._path(entry), 'r') as f:
+            lines = f.read().splitlines(keepends=True)
+        for delta_entry in reversed(chain):
+            with open(self._path(delta_entry), 'r') as f:
+                lines = apply_delta(lines, json.load(f))
+        text = "".join(lines)
+        if hashlib.sha256(text.encode()).hexdigest() != (chain[0] if chain else entry)["hash"]:
+            raise ValueError("Firewall-Snapshot beschädigt")
+        return text
+
+    def at(self, when: datetime = None) -> Optional[Dict]:
+        """Snapshot, der zum Zeitpunkt `when` aktiv war (None: neuester)"""
+        if not self.index:
+            return None
+        if when is None:
+            return self.index[-1]
+        pos = bisect.bisect_right(self.index, when.isoformat(timespec="microseconds"),
+                                  key=lambda e: e["time"])
+        return self.index[pos - 1] if pos else None
+
+    def drop_before(self, time: str) -> int:
+        """Snapshots vor `time` löschen
+
+        Nur ein Präfix der Historie ist löschbar: Deltas verweisen immer
+        auf den Nachfolger, neuere Stände hängen nie von älteren ab.
+        """
+        pos = bisect.bisect_left(self.index, time, key=lambda e: e["time"])
+        pos = min(pos, len(self.index) - 1)
+        if pos <= 0:
+            return 0
+        dropped, self.index = self.index[:pos], self.index[pos:]
+        self._save_index()
+        for entry in dropped:
+            try:
+                self._path(entry).unlink()
+            except FileNotFoundError:
+                pass
+        return len(dropped)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Abfragen auf dem Text-Log: Zeitfenster per Binärsuche, Filter per Regex"""
+
+import mmap
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+from .log_segments import SegmentStore
+
+
+# Zeile: "[ISO-Zeit] [LEVEL] Nachricht"
+LINE_RE = re.compile(rb"\[([^\]]*)\] \[([^\]]*)\] ?(.*)", re.S)
+
+
+def _key(ts: bytes) -> bytes:
+    """Vergleichbarer Zeitschlüssel (isoformat lässt .000000 weg)"""
+    return ts if len(ts) != 19 else ts + b".000000"
+
+
+def _time_key(value) -> Optional[bytes]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        value = datetime.fromtimestamp(value)
+    return _key(value.isoformat().encode())
+
+
+def _line_key(line) -> Optional[bytes]:
+    """Zeitschlüssel einer Zeile (None bei Fortsetzungszeilen)"""
+    if not line[:1] == b"[":
+        return None
+    end = line.find(b"]", 1, 40)
+    return _key(bytes(line[1:end])) if end != -1 else None
+
+
+def compile_matcher(levels: Iterable[str] = None, pattern: str = None,
+                    ignore_case: bool = False):
+    """Level- und Text-Filter zu einer Regex zusammenfassen (None = alles)"""
+    if not levels and not pattern:
+        return None
+    level_part = (b"(?:" + b"|".join(re.escape(l.upper().encode()) for l in levels) + b")"
+                  if levels else rb"[^\]]*")
+    message_part = b".*?(?:" + pattern.encode() + b")" if pattern else b""
+    flags = re.S | (re.I if ignore_case else 0)
+    return re.compile(rb"\[[^\]]*\] \[" + level_part + rb"\] ?" + message_part, flags)
+
+
+class LogQuery:
+    """Streamt passende Zeilen aus Segmenten und aktivem Log
+
+    Unkomprimierte Dateien (aktives Log, noch nicht komprimierte
+    Segmente) werden gemappt und der Startpunkt per Binärsuche auf den
+    Zeitstempeln bestimmt. Komprimierte Segmente lassen sich nicht
+    mappen: sie werden nur geöffnet, wenn ihr Zeitraum laut Manifest
+    überlappt, und dann sequentiell gelesen.
+    """
+
+    def __init__(self, text_log: Path, segments: SegmentStore = None):
+        self.text_log = Path(text_log)
+        self.segments = segments
+
+    def query(self, start=None, end=None, levels: Iterable[str] = None, pattern: str = None,
+              ignore_case: bool = False) -> Iterator[Dict]:
+        """Einträge im Zeitfenster [start, end] (datetime oder Epoch), älteste zuerst"""
+        start_key = _time_key(start)
+        end_key = _time_key(end)
+        matcher = compile_matcher(levels, pattern, ignore_case)
+
+        sources = []
+        if self.segments is not None:
+            for segment in self.segments.segments(
+                    start.timestamp() if isinstance(start, datetime) else start,
+                    end.timestamp() if isinstance(end, datetime) else end):
+                sources.append(segment)
+        sources.append(None)
+
+        for segment in sources:
+            if segment is None:
+                lines = self._mapped_lines(self.text_log, start_key)
+            elif segment["file"].endswith(".pending"):
+                lines = self._pending_lines(segment, start_key)
+            else:
+                lines = self._stream_lines(segment, start_key)
+
+            # Mehrzeilige Meldungen: Fortsetzungszeilen gehören zum Eintrag davor
+            entry = None
+            for line in lines:
+                key = _line_key(line)
+                if key is None:
+                    if entry is not None:
+                        entry.append(line)
+                    continue
+                if entry:
+                    yield _record(b"".join(entry))
+                    entry = None
+                if end_key is not None and key > end_key:
+                    # Zeitstempel sind aufsteigend: Rest dieser Quelle liegt dahinter
+                    break
+                if matcher is None or matcher.match(line):
+                    entry = [line]
+            if entry:
+                yield _record(b"".join(entry))
+
+    def _stream_lines(self, segment: Dict, start_key: Optional[bytes]) -> Iterator[bytes]:
+        try:
+            with self.segments.open_segment(segment) as f:
+                for line in f:
+                    if start_key is not None:
+                        key = _line_key(line)
+                        if key is None or key < start_key:
+                            continue
+                        start_key = None
+                    yield line
+        except OSError:
+            return
+
+    def _pending_lines(self, segment: Dict, start_key: Optional[bytes]) -> Iterator[bytes]:
+        """Unkomprimiertes Segment, oder die .gz-Datei, falls der Kompressor inzwischen fertig ist"""
+        try:
+            f = open(self.segments.directory / segment["file"], 'rb')
+        except OSError:
+            yield from self._stream_lines(segment, start_key)
+            return
+        yield from self._mapped_file(f, start_key)
+
+    def _mapped_lines(self, path: Path, start_key: Optional[bytes]) -> Iterator[bytes]:
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return
+        yield from self._mapped_file(f, start_key)
+
+    def _mapped_file(self, f, start_key: Optional[bytes]) -> Iterator[bytes]:
+        with f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Leere Datei
+                return
+            with mm:
+                pos = _lower_bound(mm, start_key) if start_key is not None else 0
+                size = len(mm)
+                while pos < size:
+                    nl = mm.find(b"\n", pos)
+                    nxt = size if nl == -1 else nl + 1
+                    yield mm[pos:nxt]
+                    pos = nxt
+
+
+def _lower_bound(mm: mmap.mmap, start_key: bytes) -> int:
+    """Beginn der ersten Zeile mit Zeitstempel >= start_key
+
+    Binärsuche über Byte-Positionen: Zeilenanfang zu `mid` suchen und
+    dessen Zeitstempel vergleichen. Fortsetzungszeilen ohne Zeitstempel
+    zählen zur vorherigen Zeile.
+    """
+    lo, hi = 0, len(mm)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        line_start = max(mm.rfind(b"\n", 0, mid) + 1, lo)
+        nl = mm.find(b"\n", line_start)
+        line_end = len(mm) if nl == -1 else nl + 1
+
+        # Fortsetzungszeile: rückwärts bis zur Zeile mit Zeitstempel
+        owner = line_start
+        key = _line_key(mm[owner:owner + 64])
+        while key is None and owner > lo:
+            owner = max(mm.rfind(b"\n", 0, owner - 1) + 1, lo)
+            key = _line_key(mm[owner:owner + 64])
+
+        if key is None or key < start_key:
+            lo = line_end
+        else:
+            hi = owner
+    return lo
+
+
+def _record(line: bytes) -> Dict:
+    match = LINE_RE.match(line)
+    text = lambda b: b.decode("utf-8", errors="replace")
+    if match is None:
+        return {"timestamp": "", "level": "", "message": text(line.rstrip(b"\n"))}
+    return {
+        "timestamp": text(match.group(1)),
+        "level": text(match.group(2)),
+        "message": text(match.group(3).rstrip(b"\n")),
+    }
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Rotation von Logs in komprimierte Segmente mit Zeit-Manifest"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+# Aufbewahrung pro Log-Art
+RETENTION_BYTES = 100 * 1024 * 1024
+RETENTION_AGE = 90 * 24 * 3600
+
+
+def text_line_time(line: bytes) -> Optional[float]:
+    """Zeitstempel einer Text-Log-Zeile "[ISO] [LEVEL] ..." """
+    end = line.find(b"]")
+    if not line.startswith(b"[") or end == -1:
+        return None
+    try:
+        return datetime.fromisoformat(line[1:end].decode()).timestamp()
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def action_line_time(line: bytes) -> Optional[float]:
+    """Zeitstempel einer Journal-Zeile (JSON mit "timestamp")"""
+    try:
+        return datetime.fromisoformat(json.loads(line)["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def first_line_time(path: Path, time_of: Callable[[bytes], Optional[float]]) -> Optional[float]:
+    try:
+        with open(path, 'rb') as f:
+            return time_of(f.readline())
+    except OSError:
+        return None
+
+
+class SegmentStore:
+    """Komprimierte Segmente einer Log-Art plus Manifest
+
+    Das Manifest (<name>.manifest.json) hält pro Segment Zeitraum,
+    Anzahl Einträge und Größe, so dass Leser nur die Segmente öffnen,
+    die einen angefragten Zeitraum überlappen. Die aktive Datei wird
+    beim Rotieren nur umbenannt (*.pending); Komprimieren, Manifest und
+    Aufbewahrung laufen im Hintergrund. Optional zählt `tags_of` pro
+    Segment Merkmale der Zeilen (z.B. Aktionstyp), so dass Abfragen
+    Segmente ohne passende Einträge überspringen. Liegengebliebene *.pending
+    (Absturz) werden beim nächsten Start nachverarbeitet.
+    """
+
+    def __init__(self, directory: Path, name: str, time_of: Callable[[bytes], Optional[float]],
+                 max_total_bytes: int = RETENTION_BYTES, max_age: float = RETENTION_AGE,
+                 tags_of: Callable[[bytes], List[str]] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.time_of = time_of
+        self.max_total_bytes = max_total_bytes
+        self.max_age = max_age
+        self.tags_of = tags_of
+        self.manifest_file = self.directory / f"{name}.manifest.json"
+        self.lock = threading.Lock()
+        self.manifest: List[Dict] = self._load_manifest()
+
+        for pending in sorted(self.directory.glob(f"{name}-*.pending")):
+            self._spawn(pending)
+
+    def _load_manifest(self) -> List[Dict]:
+        try:
+            with open(self.manifest_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def _save_manifest(self):
+        tmp = self.manifest_file.with_suffix(".tmp")
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_file)
+
+    def rotate(self, path: Path) -> Optional[Path]:
+        """Aktive Datei als Segment abgeben (nur Umbenennen, Rest im Hintergrund)"""
+        path = Path(path)
+        try:
+            if path.stat().st_size == 0:
+                return None
+        except FileNotFoundError:
+            return None
+        pending = self.directory / f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}.pending"
+        os.replace(path, pending)
+        self._spawn(pending)
+        return pending
+
+    def _spawn(self, pending: Path):
+        threading.Thread(target=self._compress, args=(pending,), daemon=True).start()
+
+    def _compress(self, pending: Path):
+        target = pending.with_suffix(".gz")
+        tmp = pending.with_suffix(".gz.tmp")
+        start = end = None
+        entries = 0
+        tags: Dict[str, int] = {}
+        try:
+            with open(pending, 'rb') as src, gzip.open(tmp, 'wb') as dst:
+                for line in src:
+                    dst.write(line)
+                    entries += 1
+                    ts = self.time_of(line)
+                    if ts is not None:
+                        start = ts if start is None else min(start, ts)
+                        end = ts if end is None else max(end, ts)
+                    if self.tags_of is not None:
+                        for tag in self.tags_of(line):
+                            tags[tag] = tags.get(tag, 0) + 1
+            os.replace(tmp, target)
+        except OSError:
+            return
+
+        segment = {
+            "file": target.name,
+            "start": start if start is not None else pending.stat().st_mtime,
+            "end": end if end is not None else pending.stat().st_mtime,
+            "entries": entries,
+            "bytes": target.stat().st_size,
+        }
+        if self.tags_of is not None:
+            segment["tags"] = tags
+        with self.lock:
+            self.manifest = [s for s in self.manifest if s["file"] != target.name]
+            self.manifest.append(segment)
+            self.manifest.sort(key=lambda s: s["start"])
+            self._save_manifest()
+            os.unlink(pending)
+            self._enforce_retention()
+
+    def _enforce_retention(self):
+        """Älteste Segmente löschen, bis Größe und Alter im Rahmen sind"""
+        cutoff = time.time() - self.max_age if self.max_age else None
+        total = sum(s["bytes"] for s in self.manifest)
+        removed = False
+        while self.manifest:
+            oldest = self.manifest[0]
+            too_big = self.max_total_bytes and total > self.max_total_bytes
+            too_old = cutoff is not None and oldest["end"] < cutoff
+            if not (too_big or too_old):
+                break
+            try:
+                os.unlink(self.directory / oldest["file"])
+            except FileNotFoundError:
+                pass
+            total -= oldest["bytes"]
+            self.manifest.pop(0)
+            removed = True
+        if removed:
+            self._save_manifest()
+
+    def segments(self, start: float = None, end: float = None, tag: str = None) -> List[Dict]:
+        """Segmente, die [start, end] überlappen (und `tag` enthalten), chronologisch
+
+        Noch nicht komprimierte Segmente haben keinen bekannten Zeitraum
+        und werden immer mitgeliefert.
+        """
+        # Erst *.pending listen, dann Manifest lesen: so geht kein Segment
+        # verloren, das gerade fertig komprimiert wird
+        pending = sorted(self.directory.glob(f"{self.name}-*.pending"))
+        with self.lock:
+            known = {s["file"] for s in self.manifest}
+            selected = [dict(s) for s in self.manifest
+                        if (start is None or s["end"] >= start) and (end is None or s["start"] <= end)
+                        and (tag is None or "tags" not in s or tag in s["tags"])]
+        for path in pending:
+            if path.with_suffix(".gz").name not in known:
+                selected.append({"file": path.name, "start": None, "end": None, "entries": None})
+        return selected
+
+    def open_segment(self, segment: Dict):
+        path = self.directory / segment["file"]
+        if path.suffix == ".pending" and not path.exists():
+            path = path.with_suffix(".gz")
+        if path.suffix == ".gz":
+            return gzip.open(path, 'rb')
+        return open(path, 'rb')
+
+    def iter_lines(self, start: float = None, end: float = None,
+                   segments: List[Dict] = None) -> Iterator[bytes]:
+        """Zeilen aller überlappenden Segmente, älteste zuerst"""
+        for segment in (segments if segments is not None else self.segments(start, end)):
+            try:
+                with self.open_segment(segment) as f:
+                    yield from f
+            except OSError:
+                continue
+
+    def total_bytes(self) -> int:
+        with self.lock:
+            return sum(s["bytes"] for s in self.manifest)
+
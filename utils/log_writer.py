@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Gepufferter Hintergrund-Schreiber für das Text-Log"""
+
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from .log_segments import SegmentStore, first_line_time
+
+
+# fsync-Strategien: nie, periodisch oder nach jedem Batch
+FSYNC_NEVER = "never"
+FSYNC_INTERVAL = "interval"
+FSYNC_ALWAYS = "always"
+
+# Diese Stufen werden nicht verworfen, wenn die Queue voll ist
+URGENT_LEVELS = {"ERROR", "CRITICAL", "ALERT"}
+
+
+class LogWriter:
+    """Schreibt Log-Zeilen aus einer begrenzten Queue in einem eigenen Thread
+
+    Aufrufer legen nur die fertige Zeile in die Queue. Der Thread
+    sammelt Zeilen und schreibt, sobald `flush_bytes` erreicht oder
+    `flush_interval` Sekunden vergangen sind. Ist die Queue voll, werden
+    normale Meldungen verworfen (und gezählt), dringende warten kurz.
+    Mit `segments` wird die Datei ab `rotate_bytes` Größe oder
+    `rotate_age` Sekunden Alter als komprimiertes Segment abgegeben.
+    """
+
+    def __init__(self, path: Path, max_queue: int = 10000, flush_bytes: int = 64 * 1024,
+                 flush_interval: float = 0.5, fsync_policy: str = FSYNC_INTERVAL,
+                 fsync_interval: float = 5.0, segments: SegmentStore = None,
+                 rotate_bytes: int = 10 * 1024 * 1024, rotate_age: float = 24 * 3600):
+        if fsync_policy not in (FSYNC_NEVER, FSYNC_INTERVAL, FSYNC_ALWAYS):
+            raise ValueError(f"Unbekannte fsync-Strategie: {fsync_policy}")
+        self.path = Path(path)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.segments = segments
+        self.rotate_bytes = rotate_bytes
+        self.rotate_age = rotate_age
+        self.dropped = 0
+        self.closed = False
+
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.started = first_line_time(self.path, segments.time_of) if segments else None
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, line: str, level: str = "INFO"):
+        """Zeile einreihen, ohne auf die Platte zu warten"""
+        if self.closed:
+            return
+        try:
+            if level in URGENT_LEVELS:
+                self.queue.put(line, timeout=0.1)
+            else:
+                self.queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Warte, bis alles bis hierher geschrieben (und ggf. gesynct) ist"""
+        if self.closed or not self.thread.is_alive():
+            return False
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Restliche Zeilen schreiben und Thread beenden"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        pending = 0
+        last_flush = last_sync = time.monotonic()
+        running = True
+
+        while running:
+            waiters = []
+            timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0.01)
+            try:
+                item = self.queue.get(timeout=timeout)
+                while True:
+                    if item is None:
+                        running = False
+                        break
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+                        pending += len(item)
+                        if pending >= self.flush_bytes:
+                            break
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if not (waiters or not running or pending >= self.flush_bytes
+                    or now - last_flush >= self.flush_interval):
+                continue
+
+            if self.dropped:
+                batch.append(f"[{time.strftime('%Y-%m-%dT%H:%M:%S')}] [WARNING] "
+                             f"{self.dropped} Log-Meldungen verworfen (Queue voll)\n")
+                self.dropped = 0
+            try:
+                if batch:
+                    self.file.write("".join(batch))
+                    self.file.flush()
+                    if self.fsync_policy == FSYNC_ALWAYS or (
+                            self.fsync_policy == FSYNC_INTERVAL
+                            and (waiters or not running or now - last_sync >= self.fsync_interval)):
+                        os.fsync(self.file.fileno())
+                        last_sync = now
+                if self.segments is not None:
+                    self._maybe_rotate()
+            except OSError:
+                pass
+            batch = []
+            pending = 0
+            last_flush = now
+            for waiter in waiters:
+                waiter.set()
+
+        self.file.close()
+
+    def _maybe_rotate(self):
+        """Aktive Datei bei Größe/Alter als Segment abgeben und neu beginnen"""
+        size = self.file.tell()
+        if not size:
+            return
+        if self.started is None:
+            self.started = time.time()
+        if size < self.rotate_bytes and time.time() - self.started < self.rotate_age:
+            return
+        self.file.close()
+        try:
+            self.segments.rotate(self.path)
+        finally:
+            self.file = open(self.path, 'a', encoding='utf-8')
+            self.started = None
@@ -1,28 +1,43 @@
 #!/usr/bin/env python3
 """Logging Modul mit Rollback-Unterstützung"""
 
-import json
-import os
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List
+import atexit
 import threading
 
+from .action_journal import ActionJournal, action_tags
+from .log_query import LogQuery
+from .log_segments import SegmentStore, action_line_time, text_line_time
+from .log_writer import FSYNC_INTERVAL, LogWriter
+
 
 class ActionLogger:
     """Action-Logger für alle Aktionen"""
     
-    def __init__(self):
+    def __init__(self, fsync_policy: str = FSYNC_INTERVAL):
         self.log_dir = Path.home() / ".cyberguardian" / "logs"
         self.log_dir.mkdir(parents=True, exist_ok=True)
         
-        self.action_log = self.log_dir / "actions.json"
+        self.action_log = self.log_dir / "actions.jsonl"
+        self.legacy_action_log = self.log_dir / "actions.json"
         self.text_log = self.log_dir / "cyberguardian.log"
+        self.segment_dir = self.log_dir / "segments"
         
         self.rollback_stack = []
         self.lock = threading.Lock()
         
         self._init_log_file()
+        self.text_segments = SegmentStore(self.segment_dir, "cyberguardian", text_line_time)
+        self.action_segments = SegmentStore(self.segment_dir, "actions", action_line_time,
+                                            tags_of=action_tags)
+        self.writer = LogWriter(self.text_log, fsync_policy=fsync_policy,
+                                segments=self.text_segments)
+        atexit.register(self.close)
+        self.journal = ActionJournal(self.action_log, segments=self.action_segments)
+        self.log_query = LogQuery(self.text_log, self.text_segments)
+        self._migrate_actions()
         
     def _init_log_file(self):
         """Initialisiere Log-Datei"""
@@ -33,10 +48,31 @@ class ActionLogger:
         """Logge Nachricht"""
         timestamp = datetime.now().isoformat()
         log_entry = f"[{timestamp}] [{level}] {message}\n"
-        
-        with self.lock:
-            with open(self.text_log, 'a') as f:
-                f.write(log_entry)
+        self.writer.write(log_entry, level)
+
+    def query_logs(self, start=None, end=None, levels=None, pattern: str = None,
+                   ignore_case: bool = False):
+        """Durchsuche das Text-Log nach Zeitfenster, Level und Regex (Generator)"""
+        return self.log_query.query(start, end, levels, pattern, ignore_case)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Warte, bis alle bisherigen Meldungen auf der Platte sind"""
+        return self.writer.flush(timeout)
+
+    def close(self):
+        """Log-Schreiber und Journal schließen (beim Beenden)"""
+        self.writer.close()
+        self.journal.close()
+
+    def _migrate_actions(self):
+        """Übernimm alte actions.json einmalig ins Journal"""
+        try:
+            migrated = self.journal.migrate_json(self.legacy_action_log)
+        except (OSError, ValueError) as e:
+            self.log("WARNING", f"actions.json konnte nicht migriert werden: {e}")
+            return
+        if migrated is not None:
+            self.log("INFO", f"{migrated} Aktionen nach {self.action_log.name} migriert")
                 
     def log_action(self, action_type: str, details: str, reversible: bool = False, 
                    rollback_data: Dict = None):
@@ -53,10 +89,7 @@ class ActionLogger:
         if reversible and rollback_data:
             self.rollback_stack.append(action)
             
-        with self.lock:
-            actions = self._load_actions()
-            actions.append(action)
-            self._save_actions(actions)
+        self.journal.append(action)
             
         self.log("INFO", f"Aktion: {action_type} - {details}")
         
@@ -68,22 +101,22 @@ class ActionLogger:
         return hashlib.md5(data.encode()).hexdigest()[:8]
         
     def _load_actions(self) -> List[Dict]:
-        """Lade Aktionen aus Datei"""
-        if self.action_log.exists():
-            with open(self.action_log, 'r') as f:
-                return json.load(f)
-        return []
-        
-    def _save_actions(self, actions: List[Dict]):
-        """Speichere Aktionen"""
-        with open(self.action_log, 'w') as f:
-            json.dump(actions, f, indent=2)
+        """Lade Aktionen aus dem Journal"""
+        return self.journal.read_all()
             
     def get_recent(self, count: int = 20) -> List[Dict]:
         """Hole letzte Aktionen"""
-        actions = self._load_actions()
-        return actions[-count:]
+        return self.journal.recent(count)
+
+    def get_actions(self, start: datetime = None, end: datetime = None) -> List[Dict]:
+        """Hole Aktionen eines Zeitraums (öffnet nur passende Segmente)"""
+        return list(self.journal.iter_range(start.timestamp() if start else None,
+                                            end.timestamp() if end else None))
         
+    def get_actions_by_type(self, action_type: str) -> List[Dict]:
+        """Hole alle Aktionen eines Typs"""
+        return self.journal.by_type(action_type)
+
     def get_rollback_actions(self) -> List[Dict]:
         """Hole alle reversiblen Aktionen"""
-        return [a for a in self._load_actions() if a.get('reversible')]
+        return self.journal.rollback_actions()